@@ -0,0 +1,34 @@
+import sqlite3
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import db
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик: локальная '
+            'замена репликации')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены, см. YATUBE_REPLICAS')
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError('Копировать умеем только SQLite')
+        source.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            # Реплика открывается как file:<путь>?mode=ro.
+            path = urlsplit(connections[alias].settings_dict['NAME']).path
+            target = sqlite3.connect(path)
+            try:
+                source.connection.backup(target)
+                # Реплику открывают только для чтения: журнал ей не сменить.
+                journal = db.pragmas().get('journal_mode', 'delete')
+                target.execute(f'PRAGMA journal_mode = {journal}')
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: {path}')
@@ -0,0 +1,110 @@
+"""Счётчики и гистограммы процесса в текстовом формате Prometheus.
+
+Значения живут в памяти процесса: каждый воркер сервера отдаёт свои,
+суммирует их сам Prometheus.
+"""
+import threading
+from bisect import bisect_left
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REGISTRY = []
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for name, value in pairs
+    )
+    return '{%s}' % ','.join(f'{name}="{value}"' for name, value in escaped)
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.lock = threading.Lock()
+        self.series = {}
+        REGISTRY.append(self)
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self.lock:
+            series = sorted(self.series.items())
+            for labels, value in series:
+                lines.extend(self.render_series(labels, value))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.series.get(tuple(sorted(labels.items())), 0)
+
+    def render_series(self, labels, value):
+        yield f'{self.name}{format_labels(labels)} {format_number(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=SECONDS_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts, total = self.series.get(
+                key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, total = self.series.get(
+            tuple(sorted(labels.items())), ((), 0))
+        return sum(counts)
+
+    def render_series(self, labels, value):
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(self.buckets + (None,), counts):
+            cumulative += count
+            le = '+Inf' if bound is None else format_number(float(bound))
+            yield (f'{self.name}_bucket{format_labels(labels, le=le)} '
+                   f'{cumulative}')
+        yield f'{self.name}_sum{format_labels(labels)} {format_number(total)}'
+        yield f'{self.name}_count{format_labels(labels)} {cumulative}'
+
+
+def render():
+    """Все метрики процесса для ответа /metrics/."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,184 @@
+"""Профилирование запросов: SQL, шаблоны, кеш и общее время.
+
+`ProfilingMiddleware` собирает данные запроса в `RequestProfile`, а по
+его окончании раскладывает их по гистограммам с меткой `view` — именем
+URL вида `posts:index`. Шаблоны и кеш сообщают о себе через бэкенды
+`ProfiledDjangoTemplates` и `ProfiledLocMemCache`. Запросы дольше
+`PROFILING_SLOW_REQUEST_MS` попадают в лог `yatube.slow_requests`
+вместе со списком SQL.
+"""
+import logging
+import threading
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metrics
+from .sqlite_cache import SQLiteCache
+
+SLOW_REQUEST_MS = 500
+
+slow_log = logging.getLogger('yatube.slow_requests')
+_local = threading.local()
+
+REQUEST_SECONDS = metrics.Histogram(
+    'yatube_request_duration_seconds', 'Полное время обработки запроса')
+DB_QUERIES = metrics.Histogram(
+    'yatube_db_queries', 'Число SQL-запросов на запрос',
+    metrics.COUNT_BUCKETS)
+DB_SECONDS = metrics.Histogram(
+    'yatube_db_duration_seconds', 'Время SQL-запросов на запрос')
+RENDER_SECONDS = metrics.Histogram(
+    'yatube_template_render_seconds', 'Время отрисовки шаблонов на запрос')
+CACHE_REQUESTS = metrics.Counter(
+    'yatube_cache_requests_total', 'Обращения к кешу по результату')
+SLOW_REQUESTS = metrics.Counter(
+    'yatube_slow_requests_total', 'Запросы дольше порога медленного лога')
+
+
+class RequestProfile:
+    """Данные одного запроса; доступен через `current()`."""
+
+    def __init__(self):
+        self.queries = []
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_muted = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка `connection.execute_wrapper` для учёта SQL."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            self.db_seconds += elapsed
+            self.queries.append((sql, elapsed))
+
+
+def current():
+    return getattr(_local, 'profile', None)
+
+
+def record_cache(hits=0, misses=0):
+    profile = current()
+    if profile is not None and not profile.cache_muted:
+        profile.cache_hits += hits
+        profile.cache_misses += misses
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        _local.profile = profile
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        self.report(request, profile, perf_counter() - started)
+        return response
+
+    def report(self, request, profile, seconds):
+        view = view_name(request)
+        REQUEST_SECONDS.observe(seconds, view=view)
+        DB_QUERIES.observe(len(profile.queries), view=view)
+        DB_SECONDS.observe(profile.db_seconds, view=view)
+        RENDER_SECONDS.observe(profile.render_seconds, view=view)
+        if profile.cache_hits:
+            CACHE_REQUESTS.inc(profile.cache_hits, view=view, result='hit')
+        if profile.cache_misses:
+            CACHE_REQUESTS.inc(
+                profile.cache_misses, view=view, result='miss')
+        threshold = getattr(
+            settings, 'PROFILING_SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+        if seconds * 1000 < threshold:
+            return
+        SLOW_REQUESTS.inc(view=view)
+        slow_log.warning(
+            '%s %s (%s): %.0f мс, SQL %d за %.0f мс, шаблоны %.0f мс, '
+            'кеш %d/%d\n%s',
+            request.method, request.get_full_path(), view, seconds * 1000,
+            len(profile.queries), profile.db_seconds * 1000,
+            profile.render_seconds * 1000,
+            profile.cache_hits, profile.cache_hits + profile.cache_misses,
+            '\n'.join(f'  {elapsed * 1000:7.2f} мс  {sql}'
+                      for sql, elapsed in profile.queries),
+        )
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = current()
+        if profile is None or profile.render_depth:
+            return super().render(context, request)
+        profile.render_depth += 1
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.render_seconds += perf_counter() - started
+            profile.render_depth -= 1
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """Шаблонный бэкенд Django, отмечающий время отрисовки."""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return ProfiledTemplate(template.template, self)
+
+
+class ProfiledCacheMixin:
+    """Считает попадания и промахи кеша текущего запроса."""
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        hit = value is not self._missing
+        record_cache(hits=int(hit), misses=int(not hit))
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        profile = current()
+        if profile is not None:
+            # Базовый get_many вызывает get, не считаем ключи дважды.
+            profile.cache_muted += 1
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            if profile is not None:
+                profile.cache_muted -= 1
+        record_cache(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+
+class ProfiledLocMemCache(ProfiledCacheMixin, LocMemCache):
+    pass
+
+
+class ProfiledSQLiteCache(ProfiledCacheMixin, SQLiteCache):
+    pass
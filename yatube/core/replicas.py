@@ -0,0 +1,134 @@
+"""Чтение страниц с реплик базы.
+
+`ReplicaMiddleware` разрешает реплики только для GET и HEAD запросов к
+представлениям из REPLICA_VIEW_MODULES; остальной код, сигналы и
+фоновые задачи всегда работают с основной базой. После записи
+пользователь получает cookie и REPLICA_PIN_SECONDS читает с основной
+базы, чтобы сразу видеть своё. Недоступная реплика пропускается
+REPLICA_RETRY_SECONDS, пока не отвечает — чтение идёт с основной.
+С реплик читаются только модели приложений REPLICA_APP_LABELS: сессии и
+пользователи, только что записанные в основную базу, на реплике ещё нет.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'yatube_primary'
+PIN_SECONDS = 5
+RETRY_SECONDS = 30
+VIEW_MODULES = ('posts.views', 'posts.api')
+APP_LABELS = ('posts',)
+
+logger = logging.getLogger(__name__)
+_state = threading.local()
+_unavailable_until = {}
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def is_available(alias):
+    if _unavailable_until.get(alias, 0) > time.time():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except Exception:
+        logger.warning('Реплика %s недоступна', alias, exc_info=True)
+        _unavailable_until[alias] = time.time() + getattr(
+            settings, 'REPLICA_RETRY_SECONDS', RETRY_SECONDS)
+        return False
+    _unavailable_until.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    """Случайная доступная реплика или None."""
+    candidates = replicas()
+    random.shuffle(candidates)
+    return next(filter(is_available, candidates), None)
+
+
+def used_replica():
+    """Читал ли текущий запрос с реплики, которая может отставать."""
+    return getattr(_state, 'alias', None) not in (None, DEFAULT_DB_ALIAS)
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', PIN_SECONDS)
+
+
+@contextmanager
+def unpinned():
+    """Записи в блоке не закрепляют пользователя за основной базой:
+    служебные, вроде постановки фоновой задачи при чтении страницы.
+    """
+    wrote = getattr(_state, 'wrote', False)
+    try:
+        yield
+    finally:
+        _state.wrote = wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'use_replica', False):
+            return None
+        labels = getattr(settings, 'REPLICA_APP_LABELS', APP_LABELS)
+        if model._meta.app_label not in labels:
+            return None
+        if getattr(_state, 'wrote', False):
+            return DEFAULT_DB_ALIAS
+        if getattr(_state, 'alias', None) is None:
+            # Один запрос читает с одной реплики: данные согласованы.
+            _state.alias = choose_replica() or DEFAULT_DB_ALIAS
+        return _state.alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики — копии основной базы, схему меняет только она.
+        return False if db in replicas() else None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.use_replica = False
+        _state.wrote = False
+        _state.alias = None
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                response.set_cookie(
+                    PIN_COOKIE, '1', max_age=pin_seconds(),
+                    httponly=True, samesite='Lax')
+        finally:
+            _state.use_replica = False
+            _state.wrote = False
+            _state.alias = None
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        modules = getattr(settings, 'REPLICA_VIEW_MODULES', VIEW_MODULES)
+        _state.use_replica = bool(
+            replicas()
+            and request.method in ('GET', 'HEAD')
+            and PIN_COOKIE not in request.COOKIES
+            and getattr(view_func, '__module__', None) in modules
+        )
@@ -0,0 +1,241 @@
+"""Кеш в файле SQLite, общий для всех процессов сервера на машине.
+
+Журнал WAL позволяет читать параллельно с записью, поэтому воркеры
+gunicorn видят одни и те же записи и сбросы версий без внешнего
+сервиса. Размер ограничен числом записей (MAX_ENTRIES) и байтами
+(MAX_SIZE); лишнее вытесняется по давности последнего чтения (LRU).
+Время чтения копится в памяти процесса и пишется пачкой при
+следующей записи, чтобы чтения не брали блокировку на запись.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 2 ** 20},
+    }}
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL,'
+    ' accessed REAL NOT NULL, size INTEGER NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+MAX_SIZE = 64 * 2 ** 20
+BUSY_TIMEOUT_MS = 5000
+# Столько прочитанных ключей копится до записи времени чтения.
+TOUCH_BATCH = 256
+# Размеры проверяются раз в столько записей.
+CULL_EVERY = 50
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        options = params.get('OPTIONS', {})
+        self.max_size = int(options.get('MAX_SIZE', MAX_SIZE))
+        self.local = threading.local()
+        self.touched = {}
+        self.touched_lock = threading.Lock()
+        self.writes = 0
+
+    @property
+    def connection(self):
+        # После fork соединение родителя использовать нельзя.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.connection = self.connect()
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def connect(self):
+        directory = os.path.dirname(self.location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self.location, timeout=BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def row(self, key, value, timeout, now):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return key, data, self.get_backend_timeout(timeout), now, len(data)
+
+    def touch_later(self, keys, now):
+        with self.touched_lock:
+            self.touched.update(dict.fromkeys(keys, now))
+            full = len(self.touched) >= TOUCH_BATCH
+        if full:
+            with self.transaction() as connection:
+                self.flush_touched(connection)
+
+    def flush_touched(self, connection):
+        with self.touched_lock:
+            touched, self.touched = self.touched, {}
+        connection.executemany(
+            'UPDATE cache SET accessed = ? WHERE key = ? AND accessed < ?',
+            [(when, key, when) for key, when in touched.items()])
+
+    def select(self, keys):
+        """Живые записи `keys`; время чтения запомнится для LRU."""
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            f'AND {ALIVE}', [*keys, now]).fetchall()
+        if rows:
+            self.touch_later([key for key, value in rows], now)
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def get(self, key, default=None, version=None):
+        key = self.key(key, version)
+        return self.select([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self.key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        return {
+            keys[key]: value for key, value in self.select(list(keys)).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self.row(self.key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)', rows)
+            self.after_write(connection, len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Атомарно для всех процессов: годится для локов."""
+        now = time.time()
+        row = self.row(self.key(key, version), value, timeout, now)
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO cache VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = excluded.expires, accessed = excluded.accessed, '
+                'size = excluded.size '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                [*row, now])
+            added = cursor.rowcount == 1
+            self.after_write(connection, int(added))
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.key(key, version)
+        now = time.time()
+        with self.transaction() as connection:
+            found = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                [key, now]).fetchone()
+            if found is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(found[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ?, size = ? '
+                'WHERE key = ?', [data, now, len(data), key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        now = time.time()
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                f'UPDATE cache SET expires = ?, accessed = ? '
+                f'WHERE key = ? AND {ALIVE}',
+                [self.get_backend_timeout(timeout), now, key, now])
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        return bool(self.connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            [self.key(key, version), time.time()]).fetchone())
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self.key(key, version),) for key in keys]
+        with self.transaction() as connection:
+            connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+
+    def clear(self):
+        with self.touched_lock:
+            self.touched = {}
+        with self.transaction() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь процесс: кеш закрывают после каждого
+        # запроса, а открывать файл заново дорого.
+        pass
+
+    def after_write(self, connection, count):
+        if self.touched:
+            self.flush_touched(connection)
+        self.writes += count
+        if self.writes >= CULL_EVERY:
+            self.writes = 0
+            self.cull(connection)
+
+    def cull(self, connection):
+        """Удаляет просроченное, затем давно не читанное сверх лимитов."""
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', [time.time()])
+        entries, size = connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+        if entries > self._max_entries:
+            # Как в Django: сверх лимита уходит 1/CULL_FREQUENCY записей.
+            excess = entries - self._max_entries
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                [max(excess, entries // self._cull_frequency)])
+            size = connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+        if size > self.max_size:
+            excess = size - self.max_size + self.max_size // (
+                self._cull_frequency)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM ('
+                ' SELECT key, SUM(size) OVER (ORDER BY accessed, key) - size'
+                ' AS before FROM cache) WHERE before < ?)', [excess])
@@ -0,0 +1,79 @@
+"""Шаблоны в памяти для боевого режима.
+
+С DEBUG и APP_DIRS Django заново читает и разбирает шаблон с диска при
+каждой отрисовке. В боевом режиме settings оборачивает загрузчики в
+`cached.Loader`, а `warm_up` при старте воркера компилирует все шаблоны
+из каталогов DIRS и загружает библиотеки тегов страниц: первый запрос
+уже не читает диск и не импортирует модули.
+"""
+import logging
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+from django.utils.functional import empty
+
+# thumbnail, кроме модуля тегов, при первом теге создаёт бэкенд,
+# хранилище ключей и движок картинок sorl — их создаём заранее.
+LIBRARIES = ('thumbnail', 'cache', 'user_filters')
+EXTENSIONS = ('.html', '.txt')
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(directories):
+    """Имена шаблонов относительно каталогов, как их ищет загрузчик."""
+    names = set()
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            names.update(
+                os.path.relpath(os.path.join(root, filename), directory)
+                .replace(os.sep, '/')
+                for filename in files if filename.endswith(EXTENSIONS))
+    return sorted(names)
+
+
+def is_cached(engine):
+    return any(isinstance(loader, CachedLoader)
+               for loader in engine.template_loaders)
+
+
+def precompile(engine):
+    """Компилирует шаблоны из DIRS в кеш загрузчика; возвращает их число.
+
+    Без `cached.Loader` держать их негде, тогда возвращает 0.
+    """
+    if not is_cached(engine):
+        return 0
+    names = template_names(engine.dirs)
+    for name in names:
+        engine.get_template(name)
+    return len(names)
+
+
+def load_libraries(engine):
+    missing = [name for name in LIBRARIES
+               if name not in engine.template_libraries]
+    if missing:
+        raise ImproperlyConfigured(
+            f'Не найдены библиотеки тегов: {", ".join(missing)}')
+    from sorl.thumbnail import default
+    for lazy in (default.backend, default.kvstore, default.engine,
+                 default.storage):
+        if lazy._wrapped is empty:
+            lazy._setup()
+
+
+def warm_up(engine=None):
+    """Готовит к первому запросу движок `engine`, по умолчанию — все
+    движки Django из TEMPLATES; возвращает число скомпилированных шаблонов.
+    """
+    if engine is None:
+        return sum(warm_up(backend.engine) for backend in engines.all()
+                   if isinstance(backend, DjangoTemplates))
+    load_libraries(engine)
+    count = precompile(engine)
+    logger.info('Шаблонов в памяти: %d', count)
+    return count
@@ -0,0 +1,164 @@
+"""JSON API только для чтения: посты ленты, группы и автора,
+комментарии поста.
+
+Страницы листаются курсором, как HTML-ленты: ответ содержит `results`
+и ссылку `next`. С `?format=ndjson` отдаётся весь список построчно
+через `StreamingHttpResponse`: строки читаются `iterator()` из
+`values_list` без создания моделей, поэтому память не зависит от
+размера выгрузки.
+"""
+from functools import reduce
+from urllib.parse import urlencode
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from . import sharding
+from .models import Comment, Group, Post, User
+from .utils import CursorPaginator
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+CHUNK_SIZE = 2000
+# Столько строк NDJSON уходит клиенту одной записью.
+LINES_PER_WRITE = 100
+NDJSON = 'application/x-ndjson'
+
+
+def image_url(image):
+    """Ссылка на картинку; страница даёт файл поля, выгрузка — имя."""
+    name = getattr(image, 'name', image)
+    return Post.image.field.storage.url(name) if name else None
+
+
+# (поле ответа, путь в модели, преобразование). Первые два — id и ключ
+# порядка: по ним шарды сливаются в один поток, см. sharding.stream.
+POST_FIELDS = (
+    ('id', 'pk', None),
+    ('pub_date', 'pub_date', None),
+    ('text', 'text', None),
+    ('author', 'author__username', None),
+    ('group', 'group__slug', None),
+    ('image', 'image', image_url),
+    ('comments_count', 'comments_count', None),
+)
+COMMENT_FIELDS = (
+    ('id', 'pk', None),
+    ('created', 'created', None),
+    ('post', 'post_id', None),
+    ('author', 'author__username', None),
+    ('text', 'text', None),
+)
+GROUP_FIELDS = ('slug', 'title', 'description')
+
+encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def attribute(instance, path):
+    """Значение по пути `author__username`; None, если связи нет."""
+    return reduce(
+        lambda value, name: getattr(value, name, None),
+        path.split('__'), instance)
+
+
+def serialize(row, fields):
+    return {
+        name: convert(value) if convert else value
+        for (name, _, convert), value in zip(fields, row)
+    }
+
+
+def not_found():
+    return JsonResponse({'detail': 'Не найдено'}, status=404)
+
+
+def limit_of(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def lines(rows, fields):
+    """Строки NDJSON пачками по LINES_PER_WRITE."""
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(serialize(row, fields)))
+        if len(batch) == LINES_PER_WRITE:
+            yield '\n'.join(batch) + '\n'
+            batch.clear()
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+
+def respond(request, queryset, fields, key, gather=False):
+    """Страница по курсору или, с ?format=ndjson, вся выгрузка."""
+    paths = [path for _, path, _ in fields]
+    if request.GET.get('format') == 'ndjson':
+        rows = queryset.order_by(f'-{key}', '-pk').values_list(*paths)
+        if gather:
+            rows = sharding.stream(rows, CHUNK_SIZE)
+        else:
+            rows = rows.iterator(CHUNK_SIZE)
+        return StreamingHttpResponse(lines(rows, fields), content_type=NDJSON)
+    limit = limit_of(request)
+    page = CursorPaginator(queryset, limit, key, gather).get_page(
+        cursor=request.GET.get('cursor'))
+    next_url = None
+    if page.next_cursor:
+        next_url = request.build_absolute_uri(
+            f'{request.path}?'
+            f'{urlencode({"cursor": page.next_cursor, "limit": limit})}')
+    return JsonResponse({
+        'results': [
+            serialize([attribute(item, path) for path in paths], fields)
+            for item in page
+        ],
+        'next': next_url,
+    }, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+def post_list(request):
+    return respond(
+        request, Post.objects.for_feed(), POST_FIELDS, 'pub_date',
+        gather=True)
+
+
+@require_safe
+def group_list(request):
+    groups = Group.objects.order_by('slug').values(*GROUP_FIELDS)
+    return JsonResponse(
+        {'results': list(groups), 'next': None},
+        json_dumps_params={'ensure_ascii': False})
+
+
+@require_safe
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return not_found()
+    return respond(
+        request, group.posts.for_feed(), POST_FIELDS, 'pub_date',
+        gather=True)
+
+
+@require_safe
+def author_posts(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return not_found()
+    return respond(request, author.posts.for_feed(), POST_FIELDS, 'pub_date')
+
+
+@require_safe
+def post_comments(request, post_id):
+    using = sharding.post_shard(post_id)
+    if not Post.objects.using(using).filter(pk=post_id).exists():
+        return not_found()
+    comments = Comment.objects.using(using).filter(
+        post_id=post_id).select_related('author').only(
+            'post', 'text', 'created', 'author__username')
+    return respond(request, comments, COMMENT_FIELDS, 'created')
@@ -0,0 +1,7 @@
+"""Нагрузочные замеры представлений Yatube.
+
+`dataset` заполняет базу воспроизводимыми данными, `runner` гоняет
+настоящие URL через тестовый клиент или локальный WSGI-сервер,
+`results` сохраняет замеры в JSON и сравнивает их с базовым прогоном.
+Точка входа — команда `bench_views`.
+"""
@@ -0,0 +1,257 @@
+"""Быстрое заполнение базы миллионами строк через `bulk_create`.
+
+Строки идут потоком пачками, id назначаются заранее, чтобы связывать
+объекты без чтения из базы. Счётчики считаются по ходу генерации,
+ленты подписок и поисковый индекс строятся одним INSERT ... SELECT.
+Распределения приближены к живым: подписчики и посты по авторам
+подчиняются степенному закону, комментарии всплесками идут к немногим
+«горячим» постам вскоре после публикации.
+"""
+import random
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker.providers.lorem.ru_RU import Provider
+from PIL import Image
+
+from posts import search
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserCounters)
+from posts.utils import explicit_dates
+
+BATCH_SIZE = 5000
+# Показатель степенного закона: чем больше, тем сильнее перекос.
+FOLLOWERS_EXPONENT = 1.1
+POSTS_EXPONENT = 0.9
+# Показатель Парето для «горячести» постов.
+HOTNESS_SHAPE = 1.2
+# Комментарии приходят в среднем через столько после поста.
+COMMENT_DELAY = timedelta(hours=2)
+GROUP_SHARE = 0.7
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def power_law(ids, exponent, rnd):
+    """Накопленные веса rank^-exponent для перемешанных `ids`."""
+    ids = list(ids)
+    rnd.shuffle(ids)
+    weights = accumulate(1 / rank ** exponent for rank in range(
+        1, len(ids) + 1))
+    return ids, list(weights)
+
+
+class Seeder:
+    def __init__(self, seed=1, batch_size=BATCH_SIZE, days=365, log=None):
+        self.rnd = random.Random(seed)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.now = timezone.now().replace(microsecond=0)
+        self.days = days
+        self.log = log or (lambda message: None)
+        self.words = sorted(Provider.word_list)
+        self.user_ids = []
+        self.group_ids = []
+        self.images = []
+        self.first_post_id = None
+        self.counters = {
+            name: Counter()
+            for name in ('posts_count', 'followers_count', 'following_count')
+        }
+
+    def insert(self, model, objects):
+        total = 0
+        for chunk in batched(objects, self.batch_size):
+            # Размер одного INSERT Django подбирает под лимиты базы.
+            model.objects.bulk_create(chunk)
+            total += len(chunk)
+        return total
+
+    def sentence(self, length):
+        words = self.rnd.choices(self.words, k=length)
+        return ' '.join(words).capitalize() + '.'
+
+    @transaction.atomic
+    def users(self, count):
+        start = next_id(User)
+        prefix = f'seed{self.seed}_'
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise ValueError(f'Пользователи {prefix}* уже есть в базе')
+        self.user_ids = list(range(start, start + count))
+        return self.insert(User, (
+            User(
+                id=pk,
+                username=f'{prefix}{pk}',
+                first_name=self.rnd.choice(self.words).capitalize(),
+                last_name=self.rnd.choice(self.words).capitalize(),
+                password='!',
+                date_joined=self.now,
+            )
+            for pk in self.user_ids
+        ))
+
+    @transaction.atomic
+    def groups(self, count):
+        start = next_id(Group)
+        self.group_ids = list(range(start, start + count))
+        return self.insert(Group, (
+            Group(
+                id=pk,
+                title=self.sentence(3)[:200],
+                slug=f'seed{self.seed}-{pk}',
+                description=self.sentence(20),
+            )
+            for pk in self.group_ids
+        ))
+
+    @transaction.atomic
+    def follows(self, count):
+        authors, weights = power_law(
+            self.user_ids, FOLLOWERS_EXPONENT, self.rnd)
+        limit = len(self.user_ids) * (len(self.user_ids) - 1)
+        pairs = set()
+        while len(pairs) < min(count, limit):
+            missing = min(count, limit) - len(pairs)
+            readers = self.rnd.choices(self.user_ids, k=missing)
+            chosen = self.rnd.choices(authors, cum_weights=weights, k=missing)
+            pairs.update(
+                (reader, author)
+                for reader, author in zip(readers, chosen) if reader != author)
+        for reader, author in pairs:
+            self.counters['following_count'][reader] += 1
+            self.counters['followers_count'][author] += 1
+        return self.insert(Follow, (
+            Follow(user_id=reader, author_id=author)
+            for reader, author in sorted(pairs)
+        ))
+
+    def make_images(self, count):
+        """Картинки-градиенты, которые потом делят между собой посты."""
+        for number in range(count):
+            color = tuple(self.rnd.randrange(256) for _ in range(3))
+            image = Image.linear_gradient('L').resize((960, 540)).convert(
+                'RGB')
+            image = Image.blend(
+                image, Image.new('RGB', image.size, color), 0.6)
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=80)
+            name = default_storage.save(
+                f'posts/seed{self.seed}_{number}.jpg',
+                ContentFile(buffer.getvalue()))
+            self.images.append(name)
+        return count
+
+    def posts_and_comments(self, posts, comments, image_share=0.0):
+        """Посты со счётчиками комментариев, затем сами комментарии."""
+        authors, weights = power_law(self.user_ids, POSTS_EXPONENT, self.rnd)
+        post_authors = self.rnd.choices(authors, cum_weights=weights, k=posts)
+        hotness = [
+            self.rnd.paretovariate(HOTNESS_SHAPE) for _ in range(posts)]
+        per_post = Counter(self.rnd.choices(
+            range(posts), weights=hotness, k=comments if posts else 0))
+        del hotness
+        span = self.days * 24 * 3600
+        offsets = [self.rnd.randrange(span) for _ in range(posts)]
+        self.first_post_id = start = next_id(Post)
+        for author in post_authors:
+            self.counters['posts_count'][author] += 1
+
+        def post_rows():
+            for number, author in enumerate(post_authors):
+                image = ''
+                if self.images and self.rnd.random() < image_share:
+                    image = self.rnd.choice(self.images)
+                group = None
+                if self.group_ids and self.rnd.random() < GROUP_SHARE:
+                    group = self.group_ids[int(
+                        len(self.group_ids) * self.rnd.random() ** 2)]
+                yield Post(
+                    id=start + number,
+                    author_id=author,
+                    group_id=group,
+                    text=self.sentence(self.rnd.randint(8, 60)),
+                    pub_date=self.now - timedelta(seconds=offsets[number]),
+                    image=image,
+                    comments_count=per_post[number],
+                )
+
+        def comment_rows():
+            for number, total in sorted(per_post.items()):
+                published = self.now - timedelta(seconds=offsets[number])
+                for _ in range(total):
+                    delay = self.rnd.expovariate(
+                        1 / COMMENT_DELAY.total_seconds())
+                    yield Comment(
+                        post_id=start + number,
+                        author_id=self.rnd.choice(self.user_ids),
+                        text=self.sentence(self.rnd.randint(3, 15)),
+                        created=min(
+                            published + timedelta(seconds=delay), self.now),
+                    )
+
+        with explicit_dates():
+            with transaction.atomic():
+                created = self.insert(Post, post_rows())
+                self.log(f'Постов: {created}')
+            with transaction.atomic():
+                created = self.insert(Comment, comment_rows())
+                self.log(f'Комментариев: {created}')
+
+    @transaction.atomic
+    def user_counters(self):
+        return self.insert(UserCounters, (
+            UserCounters(
+                user_id=pk,
+                posts_count=self.counters['posts_count'][pk],
+                followers_count=self.counters['followers_count'][pk],
+                following_count=self.counters['following_count'][pk],
+            )
+            for pk in self.user_ids
+        ))
+
+    @transaction.atomic
+    def timelines(self):
+        """Ленты подписок новых пользователей одним INSERT ... SELECT."""
+        if not self.user_ids:
+            return 0
+        entry, follow, post = (
+            connection.ops.quote_name(model._meta.db_table)
+            for model in (TimelineEntry, Follow, Post))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {entry} (user_id, author_id, post_id, pub_date) '
+                f'SELECT f.user_id, p.author_id, p.id, p.pub_date '
+                f'FROM {follow} f JOIN {post} p ON p.author_id = f.author_id '
+                f'WHERE f.user_id BETWEEN %s AND %s',
+                [self.user_ids[0], self.user_ids[-1]],
+            )
+            return cursor.rowcount
+
+    @transaction.atomic
+    def search_index(self):
+        if not search.is_supported() or self.first_post_id is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {search.TABLE} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table} WHERE id >= %s',
+                [self.first_post_id],
+            )
+            return cursor.rowcount
@@ -0,0 +1,90 @@
+"""Сравнение бэкендов кеша под нагрузкой нескольких процессов.
+
+Каждый процесс ведёт себя как воркер gunicorn: читает страницы с
+распределением Ципфа, при промахе «собирает» страницу за `render_ms`
+и кладёт её в кеш. Общий кеш прогревается один раз на всех, а
+LocMemCache каждый процесс прогревает сам.
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from itertools import accumulate
+from time import perf_counter
+
+from django.utils.module_loading import import_string
+
+from .runner import percentile
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'bench'),
+    'filebased': (
+        'django.core.cache.backends.filebased.FileBasedCache', 'files'),
+    'sqlite': ('core.sqlite_cache.SQLiteCache', 'cache.sqlite3'),
+}
+OPTIONS = {
+    'keys': 2000,
+    'operations': 3000,
+    'render_ms': 5.0,
+    'value_size': 20000,
+    'max_entries': 10000,
+}
+
+
+def make_cache(name, directory, max_entries):
+    backend, location = BACKENDS[name]
+    if name != 'locmem':
+        location = os.path.join(directory, location)
+    return import_string(backend)(location, {
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': max_entries},
+    })
+
+
+def worker(name, directory, options, seed):
+    cache = make_cache(name, directory, options['max_entries'])
+    rnd = random.Random(seed)
+    weights = list(accumulate(
+        1 / rank for rank in range(1, options['keys'] + 1)))
+    keys = rnd.choices(
+        range(options['keys']), cum_weights=weights,
+        k=options['operations'])
+    value = 'x' * options['value_size']
+    hits, gets, requests = 0, [], []
+    for key in keys:
+        started = perf_counter()
+        found = cache.get(f'page:{key}')
+        gets.append(perf_counter() - started)
+        if found is None:
+            time.sleep(options['render_ms'] / 1000)
+            cache.set(f'page:{key}', value)
+        else:
+            hits += 1
+        requests.append(perf_counter() - started)
+    return hits, gets, requests
+
+
+def run(name, processes, options, seed=1):
+    """Итоги одного бэкенда: доля попаданий, задержки и пропускная."""
+    with tempfile.TemporaryDirectory() as directory:
+        context = multiprocessing.get_context('fork')
+        started = perf_counter()
+        with context.Pool(processes) as pool:
+            parts = pool.starmap(worker, [
+                (name, directory, options, seed + number)
+                for number in range(processes)
+            ])
+        elapsed = perf_counter() - started
+    hits = sum(part[0] for part in parts)
+    gets = [value for part in parts for value in part[1]]
+    requests = [value for part in parts for value in part[2]]
+    return {
+        'hit_rate': round(hits / max(len(gets), 1), 4),
+        'get_p50_ms': round(percentile(gets, 0.5) * 1000, 3),
+        'get_p95_ms': round(percentile(gets, 0.95) * 1000, 3),
+        'p50_ms': round(percentile(requests, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(requests, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(requests, 0.99) * 1000, 3),
+        'rps': round(len(requests) / elapsed, 1),
+    }
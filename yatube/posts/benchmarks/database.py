@@ -0,0 +1,85 @@
+"""Смешанная нагрузка на SQLite: чтение ленты и запись комментариев.
+
+Потоки-читатели выбирают первую страницу главной, потоки-писатели
+добавляют комментарии в транзакции, как `add_comment`, со всеми
+сигналами. После каждой операции соединение закрывается так же, как
+в конце запроса, с учётом CONN_MAX_AGE.
+"""
+import random
+import threading
+from time import perf_counter
+
+from django.db import (OperationalError, close_old_connections, connections,
+                       transaction)
+
+from posts.models import Comment, Post, User
+
+from .runner import percentile
+
+PAGE_SIZE = 10
+
+
+def read(rnd, users, posts):
+    list(Post.objects.for_feed()[:PAGE_SIZE])
+
+
+def write(rnd, users, posts):
+    with transaction.atomic():
+        Comment.objects.create(
+            post_id=rnd.choice(posts), author_id=rnd.choice(users),
+            text='Комментарий из замера')
+
+
+def run(readers, writers, duration, seed=1):
+    """Операции, ошибки и задержки за `duration` секунд нагрузки."""
+    users = list(User.objects.values_list('pk', flat=True))
+    posts = list(Post.objects.values_list('pk', flat=True))
+    close_old_connections()
+    stop = threading.Event()
+    results = {
+        kind: {'latencies': [], 'errors': 0} for kind in ('read', 'write')}
+    lock = threading.Lock()
+
+    def loop(kind, operation, number):
+        rnd = random.Random(seed * 1000 + number)
+        latencies, errors = [], 0
+        while not stop.is_set():
+            started = perf_counter()
+            try:
+                operation(rnd, users, posts)
+            except OperationalError:
+                errors += 1
+            else:
+                latencies.append(perf_counter() - started)
+            close_old_connections()
+        with lock:
+            results[kind]['latencies'].extend(latencies)
+            results[kind]['errors'] += errors
+        connections.close_all()
+
+    threads = [
+        threading.Thread(target=loop, args=('read', read, number))
+        for number in range(readers)
+    ] + [
+        threading.Thread(target=loop, args=('write', write, number))
+        for number in range(readers, readers + writers)
+    ]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+    return {
+        kind: {
+            'ops': len(row['latencies']),
+            'ops_per_s': round(len(row['latencies']) / elapsed, 1),
+            'errors': row['errors'],
+            'p50_ms': round(percentile(row['latencies'], 0.5) * 1000, 2),
+            'p95_ms': round(percentile(row['latencies'], 0.95) * 1000, 2),
+            'p99_ms': round(percentile(row['latencies'], 0.99) * 1000, 2),
+        }
+        for kind, row in results.items()
+    }
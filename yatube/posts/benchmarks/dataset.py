@@ -0,0 +1,138 @@
+"""Воспроизводимый набор данных: один и тот же `seed` — те же данные."""
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import accumulate
+
+from django.core.management import call_command
+from django.db import connections, transaction
+from faker import Faker
+from mixer.backend.django import mixer
+
+from posts import counters, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+SIZES = {
+    'users': 50,
+    'groups': 5,
+    'posts': 1000,
+    'comments': 2000,
+    'follows': 300,
+}
+
+
+@dataclass
+class Dataset:
+    usernames: list = field(default_factory=list)
+    slugs: list = field(default_factory=list)
+    post_ids: list = field(default_factory=list)
+    words: list = field(default_factory=list)
+    # Читатель с самой большой лентой подписок.
+    reader: str = None
+
+
+def use_database(path, **options):
+    """Переключает default на отдельный файл SQLite и мигрирует его."""
+    connections.close_all()
+    connections['default'].settings_dict.update(NAME=path, **options)
+    call_command('migrate', verbosity=0, interactive=False)
+
+
+def zipf_weights(count):
+    """Накопленные веса 1/rank: немногие авторы пишут большую часть."""
+    return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+
+@transaction.atomic
+def seed(sizes=None, seed=1):
+    sizes = {**SIZES, **(sizes or {})}
+    rnd = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+
+    users = [
+        mixer.blend(
+            User,
+            username=f'user{number}',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+        )
+        for number in range(sizes['users'])
+    ]
+    groups = [
+        mixer.blend(
+            Group,
+            title=fake.sentence(nb_words=3),
+            slug=f'group{number}',
+            description=fake.paragraph(),
+        )
+        for number in range(sizes['groups'])
+    ]
+    weights = zipf_weights(len(users))
+    posts = [
+        mixer.blend(
+            Post,
+            author=rnd.choices(users, cum_weights=weights)[0],
+            group=rnd.choice(groups) if groups and rnd.random() < 0.7
+            else None,
+            text=fake.paragraph(nb_sentences=5),
+            image='',
+        )
+        for _ in range(sizes['posts'])
+    ]
+    post_weights = zipf_weights(len(posts))
+    for _ in range(sizes['comments'] if posts else 0):
+        mixer.blend(
+            Comment,
+            post=rnd.choices(posts, cum_weights=post_weights)[0],
+            author=rnd.choice(users),
+            text=fake.sentence(),
+        )
+    pairs = set()
+    limit = len(users) * (len(users) - 1)
+    while len(pairs) < min(sizes['follows'], limit):
+        user = rnd.choice(users)
+        author = rnd.choices(users, cum_weights=weights)[0]
+        if user != author:
+            pairs.add((user.pk, author.pk))
+    Follow.objects.bulk_create(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in sorted(pairs)
+    )
+    # bulk_create обходит сигналы: ленты и счётчики строятся разом.
+    timeline.rebuild()
+    counters.reconcile()
+
+    reader = most_common(user_id for user_id, _ in pairs)
+    return Dataset(
+        usernames=[user.username for user in users],
+        slugs=[group.slug for group in groups],
+        post_ids=[post.pk for post in posts],
+        words=search_words(post.text for post in posts[:50]),
+        reader=User.objects.get(pk=reader).username if reader else None,
+    )
+
+
+def search_words(texts):
+    return sorted({
+        word.strip('.,').lower()
+        for text in texts for word in text.split() if len(word) > 4
+    })
+
+
+def most_common(values):
+    counted = Counter(values).most_common(1)
+    return counted[0][0] if counted else None
+
+
+def load():
+    """Набор данных из уже заполненной базы, без записи."""
+    return Dataset(
+        usernames=list(User.objects.values_list('username', flat=True)),
+        slugs=list(Group.objects.values_list('slug', flat=True)),
+        post_ids=list(Post.objects.values_list('pk', flat=True)),
+        words=search_words(
+            Post.objects.values_list('text', flat=True)[:50]),
+        reader=most_common(
+            Follow.objects.values_list('user__username', flat=True)),
+    )
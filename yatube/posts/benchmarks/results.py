@@ -0,0 +1,66 @@
+"""Хранение замеров в JSON и сравнение с базовым прогоном."""
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+
+# Для этих метрик рост — это ухудшение, для остальных — улучшение.
+LOWER_IS_BETTER = ('p50_ms', 'p95_ms', 'p99_ms', 'queries')
+HIGHER_IS_BETTER = ('rps',)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+    }
+
+
+def save(path, options, views):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(
+            {'meta': {**environment(), **options}, 'views': views},
+            output, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(views, baseline, tolerance=0.2):
+    """Строки (view, метрика, было, стало, изменение, регрессия)."""
+    rows = []
+    for view, current in sorted(views.items()):
+        previous = baseline.get(view)
+        if not previous:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            if old:
+                change = (new - old) / old
+            else:
+                change = float('inf') if new > old else 0.0
+            if metric in LOWER_IS_BETTER:
+                regression = change > tolerance
+            else:
+                regression = change < -tolerance
+            rows.append((view, metric, old, new, change, regression))
+    return rows
@@ -0,0 +1,189 @@
+"""Прогон URL представлений с конкурентностью и сбор задержек."""
+import threading
+from itertools import count
+from math import ceil
+from socketserver import ThreadingMixIn
+from time import perf_counter
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from core import profiling
+from posts.models import User
+
+# Представления, которые открываются только после входа.
+AUTHENTICATED = {'posts:follow_index'}
+
+
+def targets(dataset, rnd, samples=5):
+    """Пути для каждого представления из URL-конфигурации posts."""
+    def pick(items):
+        return rnd.sample(list(items), min(samples, len(items)))
+
+    index = reverse('posts:index')
+    paths = {
+        'posts:index': [index] + [
+            f'{index}?page={number}' for number in range(2, samples + 1)],
+        'posts:group_list': [
+            reverse('posts:group_list', args=[slug])
+            for slug in pick(dataset.slugs)],
+        'posts:profile': [
+            reverse('posts:profile', args=[username])
+            for username in pick(dataset.usernames)],
+        'posts:post_detail': [
+            reverse('posts:post_detail', args=[pk])
+            for pk in pick(dataset.post_ids)],
+        'posts:post_comments': [
+            reverse('posts:post_comments', args=[pk])
+            for pk in pick(dataset.post_ids)],
+        'posts:search': [
+            f'{reverse("posts:search")}?{urlencode({"q": word})}'
+            for word in pick(dataset.words)],
+        'posts:follow_index': (
+            [reverse('posts:follow_index')] if dataset.reader else []),
+    }
+    return {view: urls for view, urls in paths.items() if urls}
+
+
+class ClientFetcher:
+    """Тестовый клиент Django: свой в каждом потоке."""
+
+    def __init__(self, username=None):
+        self.username = username
+        self.local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+    def client(self, authenticated):
+        attr = 'user' if authenticated else 'anonymous'
+        client = getattr(self.local, attr, None)
+        if client is None:
+            client = Client()
+            if authenticated:
+                client.force_login(User.objects.get(username=self.username))
+            setattr(self.local, attr, client)
+        return client
+
+    def __call__(self, path, authenticated=False):
+        return self.client(authenticated).get(path).status_code
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class WsgiFetcher:
+    """Настоящий WSGI-сервер на свободном порту и запросы по HTTP."""
+
+    def __init__(self, username=None):
+        self.cookie = None
+        if username:
+            client = Client()
+            client.force_login(User.objects.get(username=username))
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            self.cookie = f'{settings.SESSION_COOKIE_NAME}={session}'
+        self.server = make_server(
+            '127.0.0.1', 0, WSGIHandler(),
+            server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __call__(self, path, authenticated=False):
+        host, port = self.server.server_address
+        headers = {'Cookie': self.cookie} if authenticated else {}
+        request = Request(f'http://{host}:{port}{path}', headers=headers)
+        try:
+            with urlopen(request) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+
+
+def percentile(values, share):
+    """Процентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(ceil(share * len(ordered)) - 1, 0)]
+
+
+def run_view(view, paths, fetch, requests, concurrency):
+    """`requests` обращений к путям представления в `concurrency` потоков."""
+    authenticated = view in AUTHENTICATED
+    numbers = count()
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    number = next(numbers)
+                if number >= requests:
+                    return
+                started = perf_counter()
+                status = fetch(paths[number % len(paths)], authenticated)
+                elapsed = (perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    if status >= 400:
+                        errors.append(status)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=worker) for _ in range(max(concurrency, 1))]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, perf_counter() - started
+
+
+def run(paths, fetch, requests=200, concurrency=4, warmup=10):
+    """Замеры по представлениям; SQL считает ProfilingMiddleware."""
+    results = {}
+    for view, urls in paths.items():
+        run_view(view, urls, fetch, warmup, 1)
+        profiling.DB_QUERIES.clear()
+        latencies, errors, seconds = run_view(
+            view, urls, fetch, requests, concurrency)
+        counts, queries = profiling.DB_QUERIES.series.get(
+            (('view', view),), ((), 0))
+        results[view] = {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'mean_ms': round(sum(latencies) / max(len(latencies), 1), 3),
+            'rps': round(len(latencies) / seconds, 1) if seconds else 0,
+            'queries': round(queries / max(sum(counts), 1), 2),
+        }
+    return results
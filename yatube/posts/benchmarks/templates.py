@@ -0,0 +1,108 @@
+"""Время отрисовки шаблонов страниц.
+
+Контексты снимаются с настоящих ответов представлений на данных
+`dataset`, затем каждый шаблон страницы заново отрисовывается движком
+в одном из режимов: `disk` — как в разработке, с диска при каждой
+отрисовке; `cached` — боевой `cached.Loader`; `precompiled` — он же
+после `warm_up`. Первая отрисовка показывает цену холодного старта,
+p50/p95 — установившийся режим. Кеш фрагментов отключён, иначе
+отрисовка сводится к чтению кеша.
+"""
+from contextlib import contextmanager
+from copy import deepcopy
+from time import perf_counter
+
+from django.conf import settings
+from django.template import Template
+from django.test.utils import (ContextList, instrumented_test_render,
+                               override_settings)
+from django.utils.module_loading import import_string
+
+from core.template_cache import warm_up
+
+from .runner import AUTHENTICATED, ClientFetcher, percentile
+
+MODES = ('disk', 'cached', 'precompiled')
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def make_backend(mode):
+    """Бэкенд из settings.TEMPLATES с загрузчиками режима `mode`."""
+    params = deepcopy(settings.TEMPLATES[0])
+    params.update(NAME=f'bench-{mode}', APP_DIRS=False)
+    cached = mode != 'disk'
+    params['OPTIONS'].update(
+        debug=not cached,
+        loaders=[('django.template.loaders.cached.Loader', LOADERS)]
+        if cached else LOADERS,
+    )
+    backend = import_string(params.pop('BACKEND'))(params)
+    if mode == 'precompiled':
+        warm_up(backend.engine)
+    return backend
+
+
+@contextmanager
+def instrumented():
+    """Шаблоны шлют `template_rendered`, как в тестах: тестовый клиент
+    сохраняет контекст в ответе.
+    """
+    original = Template._render
+    Template._render = instrumented_test_render
+    try:
+        yield
+    finally:
+        Template._render = original
+
+
+def capture(paths, username=None):
+    """{шаблон страницы: (контекст, запрос)} по первому URL представлений.
+    """
+    fetch = ClientFetcher(username)
+    pages = {}
+    with instrumented():
+        for view, urls in paths.items():
+            client = fetch.client(view in AUTHENTICATED)
+            response = client.get(urls[0])
+            if response.status_code != 200 or not response.templates:
+                continue
+            context = response.context
+            if isinstance(context, ContextList):
+                context = context[0]
+            pages.setdefault(response.templates[0].name, (
+                context.flatten(), response.wsgi_request))
+    return pages
+
+
+def measure(backend, name, context, request, renders):
+    timings = []
+    for _ in range(renders):
+        started = perf_counter()
+        backend.get_template(name).render(context, request)
+        timings.append((perf_counter() - started) * 1000)
+    return {
+        'renders': renders,
+        'first_ms': round(timings[0], 3),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(sum(timings) / renders, 3),
+    }
+
+
+def run(paths, username=None, renders=200, modes=MODES):
+    """Замеры по ключам `режим:шаблон`."""
+    results = {}
+    with override_settings(CACHES=DUMMY_CACHES):
+        pages = capture(paths, username)
+        for mode in modes:
+            backend = make_backend(mode)
+            for name, (context, request) in sorted(pages.items()):
+                results[f'{mode}:{name}'] = measure(
+                    backend, name, context, request, renders)
+    return results
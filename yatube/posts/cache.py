@@ -0,0 +1,450 @@
+"""Версионированный кеш страниц и фрагментов.
+
+Ключ кеша включает версии областей (scope), от которых зависит
+содержимое: `index`, `group:<slug>`, `profile:<username>`, `post:<id>`.
+Сигналы Post, Comment и Follow увеличивают версии только затронутых
+областей, поэтому записи могут жить долго и не устаревать.
+
+Карточки постов в лентах кешируются по отдельности (`post_cards`):
+когда страница сбрасывается из-за нового поста, остальные карточки
+берутся из кеша одним запросом.
+
+Страница хранится одной записью вместе с версиями, из которых она
+собрана. Устаревшую запись пересчитывает один запрос, взявший лок,
+остальные в это время получают старую копию. Незадолго до истечения
+срока запись пересчитывается досрочно с вероятностью, растущей к концу
+срока и со временем сборки страницы (XFetch), чтобы записи не истекали
+у всех одновременно.
+
+`conditional_page` отвечает 304 Not Modified без отрисовки, если у
+клиента актуальная копия: ETag и Last-Modified складываются из версий
+областей, времени их последнего сброса и даты последней публикации.
+Дата публикации кешируется до смены версий, автор поста — до правки,
+поэтому страница из кеша не обращается к базе.
+"""
+import math
+import random
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from core import metrics, replicas
+
+from . import sharding
+from .models import Post
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
+AUTHOR_CACHE_TIMEOUT = 24 * 60 * 60
+# Столько после срока свежести запись ещё можно отдавать устаревшей.
+STALE_TIMEOUT = 10 * 60
+# Лок пересчёта освободится сам, если его владелец упал.
+LOCK_TIMEOUT = 30
+# Без копии в кеше остальные ждут пересчёта не дольше этого.
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+# Чем больше, тем раньше начинается досрочный пересчёт.
+EARLY_EXPIRY_BETA = 1.0
+
+PAGE_LOCKS = metrics.Counter(
+    'yatube_page_cache_locks_total',
+    'Попытки взять лок пересчёта страницы: acquired или contended')
+STALE_PAGES = metrics.Counter(
+    'yatube_page_cache_stale_total',
+    'Устаревшие копии страниц, отданные во время пересчёта')
+EARLY_REFRESHES = metrics.Counter(
+    'yatube_page_cache_early_refresh_total',
+    'Досрочные пересчёты страниц до истечения срока')
+
+
+def version_key(scope):
+    # Слаги и имена пользователей могут содержать не-ASCII символы.
+    return f'posts-version:{md5(scope.encode()).hexdigest()}'
+
+
+def changed_key(scope):
+    return f'posts-changed:{md5(scope.encode()).hexdigest()}'
+
+
+def initial_version():
+    # Версия, созданная после вытеснения ключа, не совпадёт со старыми.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """Текущие версии областей; недостающие создаются."""
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Сбрасывает всё, что закешировано для указанных областей."""
+    for scope in set(scopes):
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, initial_version(), None)
+    now = time.time()
+    cache.set_many({changed_key(scope): now for scope in scopes}, None)
+
+
+def changed_at(*scopes):
+    """Когда области сбрасывались последний раз, если это известно."""
+    times = cache.get_many([changed_key(scope) for scope in scopes])
+    return max(times.values(), default=None)
+
+
+def index_scopes():
+    return ['index']
+
+
+def search_scopes():
+    # Индекс поиска обновляется задачей после сохранения поста.
+    return ['index', 'search']
+
+
+def group_scopes(slug):
+    return [f'group:{slug}']
+
+
+def profile_scopes(username):
+    return [f'profile:{username}']
+
+
+def author_key(post_id):
+    return f'posts-author:{post_id}'
+
+
+def forget_authors(post_ids):
+    """Сбрасывает запомненных авторов постов: сменился автор или имя."""
+    cache.delete_many([author_key(post_id) for post_id in post_ids])
+
+
+def post_scopes(post_id):
+    """Страница поста зависит ещё и от автора: счётчик его постов.
+
+    Имя автора кешируется, как шард поста в `sharding.post_shard`.
+    """
+    key = author_key(post_id)
+    author = cache.get(key)
+    if author is None:
+        author = Post.objects.using(sharding.post_shard(post_id)).filter(
+            pk=post_id).values_list('author__username', flat=True).first()
+        if author is not None:
+            cache.set(key, author, AUTHOR_CACHE_TIMEOUT)
+    return [f'post:{post_id}', f'profile:{author}']
+
+
+def comments_scopes(post_id):
+    return [f'post:{post_id}']
+
+
+def latest(queryset, *fields, gather=False):
+    querysets = sharding.spread(queryset) if gather else [queryset]
+    dates = [
+        date for shard in querysets for date in shard.aggregate(
+            **{f'last_{number}': Max(field) for number, field in enumerate(
+                fields)}).values()
+    ]
+    return max(filter(None, dates), default=None)
+
+
+def index_modified():
+    return latest(Post.objects.all(), 'pub_date', gather=True)
+
+
+def group_modified(slug):
+    return latest(
+        Post.objects.filter(group__slug=slug), 'pub_date', gather=True)
+
+
+def profile_modified(username):
+    return latest(
+        Post.objects.using(sharding.username_shard(username)).filter(
+            author__username=username),
+        'pub_date')
+
+
+def post_modified(post_id):
+    return latest(
+        Post.objects.using(sharding.post_shard(post_id)).filter(pk=post_id),
+        'pub_date', 'comments__created')
+
+
+def post_changed_scopes(post):
+    scopes = ['index', f'post:{post.pk}', f'profile:{post.author.username}']
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+def author_changed_scopes(user, previous_username):
+    """Страницы, где видно имя автора: лента, профиль и его группы."""
+    posts = Post.objects.using(sharding.author_shard(user.pk)).filter(
+        author_id=user.pk, group__isnull=False)
+    slugs = posts.values_list('group__slug', flat=True).distinct()
+    return ['index', f'profile:{previous_username}',
+            f'profile:{user.username}', *map('group:{}'.format, slugs)]
+
+
+def group_changed_scopes(group, previous_slug=None):
+    """Страницы, где видна группа: лента, её страница, посты группы и
+    профили их авторов.
+    """
+    scopes = ['index', f'group:{group.slug}']
+    if previous_slug:
+        scopes.append(f'group:{previous_slug}')
+    if group.pk:
+        for posts in sharding.spread(Post.objects.filter(group_id=group.pk)):
+            for post_id, username in posts.values_list(
+                    'pk', 'author__username'):
+                scopes += [f'post:{post_id}', f'profile:{username}']
+    return scopes
+
+
+def card_key(post, version, variant):
+    """Ключ карточки: версия поста и всё, что карточка из него выводит.
+
+    Переименование автора или группы меняет ключ без сброса версий.
+    """
+    fingerprint = md5('\0'.join(str(value) for value in (
+        post.text, post.pub_date.isoformat(), post.image.name,
+        post.image_variants, post.group.slug if post.group_id else '',
+        post.author.username, post.author.get_full_name(),
+    )).encode()).hexdigest()
+    return f'post-card:{variant}:{post.pk}:{version}:{fingerprint}'
+
+
+def post_cards(posts, render, variant='full'):
+    """HTML карточек постов страницы.
+
+    Готовые карточки читаются одним `get_many`, недостающие
+    отрисовывает `render(post)` и они кладутся одним `set_many`.
+    Версия `post:<id>` меняется при правке поста и готовности миниатюры.
+    """
+    posts = list(posts)
+    if not posts:
+        return []
+    versions = get_versions(*(f'post:{post.pk}' for post in posts))
+    keys = [card_key(post, version, variant)
+            for post, version in zip(posts, versions)]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render(post) for key, post in zip(keys, posts)
+        if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [cards[key] for key in keys]
+
+
+def request_variant(request):
+    """Анонимы получают общую копию, авторизованные — свою на сессию."""
+    if not request.user.is_authenticated:
+        return 'anon'
+    session = request.session.session_key or ''
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    digest = md5(f'{session}:{csrf}'.encode()).hexdigest()
+    return f'user{request.user.pk}:{digest}'
+
+
+def page_key(request):
+    path = md5(request.get_full_path().encode()).hexdigest()
+    return f'posts-page:{path}:{request_variant(request)}'
+
+
+def versions_tag(scopes):
+    return '.'.join(str(version) for version in get_versions(*scopes))
+
+
+def published_at(last_modified, kwargs, scopes, versions):
+    """Дата последней публикации на странице.
+
+    Новый пост или комментарий меняет версию области страницы, поэтому
+    при тех же версиях дата берётся из кеша без запроса к базе.
+    """
+    key = 'posts-published:' + md5(
+        ':'.join((*scopes, versions)).encode()).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached[0]
+    published = last_modified(**kwargs)
+    timeout = PAGE_CACHE_TIMEOUT
+    if replicas.used_replica():
+        timeout = min(timeout, replicas.pin_seconds())
+    cache.set(key, (published,), timeout)
+    return published
+
+
+def is_fresh(entry, versions, now=None):
+    """Запись собрана из текущих версий и не выбрана для пересчёта.
+
+    Досрочный пересчёт (XFetch): срок словно наступает раньше на
+    delta * beta * -ln(u), где delta — время сборки страницы.
+    """
+    if entry['versions'] != versions:
+        return False
+    now = time.time() if now is None else now
+    gap = -entry['delta'] * EARLY_EXPIRY_BETA * math.log(1 - random.random())
+    return now + gap < entry['expires']
+
+
+def entry_response(entry):
+    return HttpResponse(entry['content'], content_type=entry['content_type'])
+
+
+class CachedPage:
+    """Представление под кешем: один пересчёт на ключ, остальным — копия."""
+    def __init__(self, view, scopes, timeout):
+        self.view = view
+        self.scopes = scopes
+        self.timeout = timeout
+        self.label = view.__name__
+
+    def __call__(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return self.view(request, *args, **kwargs)
+        key = page_key(request)
+        versions = versions_tag(self.scopes(**kwargs))
+        entry = cache.get(key)
+        if entry is not None and is_fresh(entry, versions):
+            response = entry_response(entry)
+        else:
+            if self.is_valid(entry, versions):
+                EARLY_REFRESHES.inc(view=self.label)
+            response = self.revalidate(
+                request, key, entry, versions, args, kwargs)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    @staticmethod
+    def is_valid(entry, versions):
+        return (entry is not None and entry['versions'] == versions
+                and entry['expires'] > time.time())
+
+    def revalidate(self, request, key, entry, versions, args, kwargs):
+        lock = f'{key}:lock'
+        if cache.add(lock, 1, LOCK_TIMEOUT):
+            PAGE_LOCKS.inc(view=self.label, result='acquired')
+            try:
+                return self.render(request, key, versions, args, kwargs)
+            finally:
+                cache.delete(lock)
+        PAGE_LOCKS.inc(view=self.label, result='contended')
+        if entry is not None:
+            if not self.is_valid(entry, versions):
+                STALE_PAGES.inc(view=self.label)
+            return entry_response(entry)
+        entry = self.wait(key, versions)
+        if entry is not None:
+            return entry_response(entry)
+        return self.render(request, key, versions, args, kwargs)
+
+    @staticmethod
+    def wait(key, versions):
+        """Ждёт копию от владельца лока, пока не выйдет LOCK_WAIT."""
+        deadline = time.time() + LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(LOCK_POLL)
+            entry = cache.get(key)
+            if entry is not None and entry['versions'] == versions:
+                return entry
+        return None
+
+    def render(self, request, key, versions, args, kwargs):
+        started = time.time()
+        response = self.view(request, *args, **kwargs)
+        if is_cacheable(request, response):
+            finished = time.time()
+            timeout = self.timeout
+            if replicas.used_replica():
+                # Реплика могла ещё не получить изменение, из-за которого
+                # сменилась версия: такая копия живёт не дольше отставания.
+                timeout = min(timeout, replicas.pin_seconds())
+            cache.set(key, {
+                'versions': versions,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'expires': finished + timeout,
+                'delta': finished - started,
+            }, timeout + STALE_TIMEOUT)
+        return response
+
+
+def cached_page(scopes, timeout=PAGE_CACHE_TIMEOUT):
+    """Кеширует ответ представления до смены версии его областей.
+
+    `scopes` получает именованные аргументы представления и возвращает
+    список областей, от которых зависит страница.
+    """
+    def decorator(view):
+        return wraps(view)(CachedPage(view, scopes, timeout))
+    return decorator
+
+
+def conditional_page(scopes, last_modified):
+    """Отвечает 304, если у клиента актуальная копия страницы.
+
+    `last_modified` получает именованные аргументы представления и
+    возвращает дату последней публикации или комментария на странице
+    (одним запросом по индексу). Страница авторизованного пользователя
+    своя у каждой сессии: она входит в ETag, а ответ помечается private.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_scopes = scopes(**kwargs)
+            versions = versions_tag(page_scopes)
+            dates = [changed_at(*page_scopes)]
+            published = published_at(
+                last_modified, kwargs, page_scopes, versions)
+            if published is not None:
+                dates.append(published.timestamp())
+            modified = max(filter(None, dates), default=None)
+            etag = quote_etag(md5(':'.join((
+                request.get_full_path(), request_variant(request),
+                versions, str(modified),
+            )).encode()).hexdigest())
+            modified = int(modified) if modified is not None else None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response['ETag'] = etag
+                    if modified is not None:
+                        response['Last-Modified'] = http_date(modified)
+            patch_vary_headers(response, ('Cookie',))
+            # Копию можно хранить, но перед показом надо сверить ETag.
+            control = {'no_cache': True}
+            if request.user.is_authenticated:
+                control['private'] = True
+            patch_cache_control(response, **control)
+            return response
+        return wrapper
+    return decorator
+
+
+def is_cacheable(request, response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    # Форма с CSRF-токеном годится только для браузера с этой cookie.
+    return not (request.META.get('CSRF_COOKIE_USED')
+                and settings.CSRF_COOKIE_NAME not in request.COOKIES)
@@ -0,0 +1,125 @@
+"""Денормализованные счётчики: посты и подписки пользователя,
+комментарии поста.
+
+Счётчики меняют фоновые задачи (posts.tasks), которые сигналы ставят
+в очередь вместе с записью, а `reconcile` пересчитывает их пакетно,
+если они разошлись с данными (например, после `bulk_create`).
+Посты и комментарии считаются в каждом шарде (posts.sharding).
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import sharding
+from .models import (Comment, Follow, Post, ShardAssignment, User,
+                     UserCounters)
+
+
+def add(user_id, **deltas):
+    """Прибавляет к счётчикам пользователя, например posts_count=1."""
+    increment(UserCounters.objects.filter(user_id=user_id), **deltas)
+
+
+def add_comments(post_id, delta, using=None):
+    """Меняет счётчик комментариев поста в базе `using` — его шарде."""
+    increment(
+        Post.objects.using(using).filter(pk=post_id), comments_count=delta)
+
+
+def increment(queryset, **deltas):
+    # Счётчик не уходит в минус, даже если разошёлся с данными.
+    for name, delta in deltas.items():
+        if delta < 0:
+            queryset = queryset.filter(**{f'{name}__gte': -delta})
+    queryset.update(
+        **{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def for_user(user):
+    """Счётчики пользователя; отсутствующая строка создаётся пересчётом."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        pass
+    # Автор, прочитанный из шарда, приходит без счётчиков основной базы.
+    counters = UserCounters.objects.filter(user_id=user.pk).first()
+    if counters is None:
+        reconcile(users=[user.pk])
+        counters = UserCounters.objects.get(user_id=user.pk)
+    return counters
+
+
+def count_of(queryset, field):
+    """Подзапрос COUNT(*) по `field`, связанному с внешней строкой."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def posts_counts(users=None):
+    """Число постов авторов по всем шардам.
+
+    Пока автор переезжает, его посты есть в двух шардах, поэтому
+    считаются только посты в шарде, закреплённом за автором.
+    """
+    homes = ShardAssignment.objects.values_list('author_id', 'shard')
+    posts = Post.objects.order_by().values_list('author').annotate(
+        Count('pk'))
+    if users is not None:
+        homes = homes.filter(author__in=users)
+        posts = posts.filter(author__in=users)
+    homes = dict(homes)
+    totals = {}
+    for alias, shard in zip(sharding.shards(), sharding.spread(posts)):
+        for author_id, total in shard:
+            if homes.get(author_id, DEFAULT_DB_ALIAS) == alias:
+                totals[author_id] = total
+    return totals
+
+
+def reconcile_posts_counts(counters, users=None):
+    """posts_count по шардам: подзапрос не дотянется до других баз."""
+    totals = posts_counts(users)
+    stale = [
+        (pk, totals.get(pk, 0))
+        for pk, count in counters.values_list(
+            'pk', 'posts_count').iterator()
+        if count != totals.get(pk, 0)
+    ]
+    for pk, total in stale:
+        UserCounters.objects.filter(pk=pk).update(posts_count=total)
+    return len(stale)
+
+
+@transaction.atomic
+def reconcile(users=None):
+    """Исправляет расхождения; возвращает число исправленных строк."""
+    missing = User.objects.filter(counters__isnull=True)
+    counters = UserCounters.objects.all()
+    posts = Post.objects.all()
+    if users is not None:
+        missing = missing.filter(pk__in=users)
+        counters = counters.filter(pk__in=users)
+        posts = posts.filter(author__in=users)
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=pk)
+         for pk in missing.values_list('pk', flat=True).iterator()),
+        ignore_conflicts=True,
+    )
+    real = {
+        'followers_count': count_of(Follow.objects.all(), 'author'),
+        'following_count': count_of(Follow.objects.all(), 'user'),
+    }
+    if not sharding.is_sharded():
+        real['posts_count'] = count_of(Post.objects.all(), 'author')
+    fixed = counters.exclude(**real).update(**real)
+    if sharding.is_sharded():
+        fixed += reconcile_posts_counts(counters, users)
+    # Комментарии лежат в шарде своего поста: подзапрос идёт в ту же базу.
+    comments = count_of(Comment.objects.all(), 'post')
+    return fixed + sum(
+        shard.exclude(comments_count=comments).update(
+            comments_count=comments)
+        for shard in sharding.spread(posts))
@@ -0,0 +1,143 @@
+"""RSS и Atom главной ленты, групп и авторов.
+
+Ленты опрашивают часто, поэтому ответ собирается из снимка последних
+FEED_SIZE постов в кеше. Ключ снимка и ETag содержат версии тех же
+областей кеша, что и HTML-страницы (posts.cache): новый или изменённый
+пост сбрасывает их сигналами. Пока данные не менялись, запрос ленты
+не обращается к базе — ни для 304, ни для полного ответа.
+"""
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+from django.views.decorators.http import require_safe
+
+from . import sharding
+from .cache import (group_scopes, index_scopes, profile_scopes,
+                    versions_tag)
+from .models import Group, Post, User
+
+FEED_SIZE = 20
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+TITLE_WORDS = 8
+GENERATORS = {'rss': Rss201rev2Feed, 'atom': Atom1Feed}
+
+
+def snapshot(title, link, posts):
+    """Всё, что нужно ленте, без моделей: так снимок мал и быстро
+    читается из кеша.
+    """
+    return {
+        'title': title,
+        'link': link,
+        'items': [(
+            post.pk,
+            post.pub_date,
+            Truncator(post.text).words(TITLE_WORDS),
+            post.text,
+            post.author.username,
+            post.author.get_full_name() or post.author.username,
+        ) for post in posts],
+    }
+
+
+def latest(queryset):
+    return sharding.gather(
+        queryset.order_by('-pub_date', '-pk'), 'pub_date', FEED_SIZE)
+
+
+def index_snapshot():
+    return snapshot(
+        'Последние обновления на сайте Yatube', reverse('posts:index'),
+        latest(Post.objects.for_feed()))
+
+
+def group_snapshot(slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return None
+    return snapshot(
+        f'Записи сообщества: {group.title}',
+        reverse('posts:group_list', args=[slug]),
+        latest(group.posts.for_feed()))
+
+
+def profile_snapshot(username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return None
+    return snapshot(
+        f'Все посты пользователя {author.get_full_name() or username}',
+        reverse('posts:profile', args=[username]),
+        author.posts.for_feed().order_by('-pub_date', '-pk')[:FEED_SIZE])
+
+
+def render(request, data, generator):
+    feed = generator(
+        title=data['title'],
+        link=request.build_absolute_uri(data['link']),
+        description=data['title'],
+        language='ru',
+        feed_url=request.build_absolute_uri(),
+    )
+    for pk, pub_date, title, text, username, name in data['items']:
+        link = request.build_absolute_uri(
+            reverse('posts:post_detail', args=[pk]))
+        feed.add_item(
+            title=title, link=link, description=text, unique_id=link,
+            pubdate=pub_date, author_name=name,
+            author_link=request.build_absolute_uri(
+                reverse('posts:profile', args=[username])),
+        )
+    response = HttpResponse(content_type=feed.content_type)
+    feed.write(response, 'utf-8')
+    if data['items']:
+        response['Last-Modified'] = http_date(
+            data['items'][0][1].timestamp())
+    return response
+
+
+def serve(request, feed_type, scopes, build):
+    """Лента по снимку из кеша; 304, если у клиента она уже есть."""
+    versions = versions_tag(scopes)
+    etag = quote_etag(md5(':'.join((
+        feed_type, request.get_host(), request.path, versions,
+    )).encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        scope = md5(':'.join(scopes).encode()).hexdigest()
+        key = f'posts-feed:{scope}:{versions}'
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            if data is None:
+                raise Http404
+            cache.set(key, data, SNAPSHOT_TIMEOUT)
+        response = render(request, data, GENERATORS[feed_type])
+        response['ETag'] = etag
+    # Читатели опрашивают ленту часто: пусть сверяют ETag каждый раз.
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_safe
+def index_feed(request, feed_type):
+    return serve(request, feed_type, index_scopes(), index_snapshot)
+
+
+@require_safe
+def group_feed(request, slug, feed_type):
+    return serve(
+        request, feed_type, group_scopes(slug), lambda: group_snapshot(slug))
+
+
+@require_safe
+def profile_feed(request, username, feed_type):
+    return serve(
+        request, feed_type, profile_scopes(username),
+        lambda: profile_snapshot(username))
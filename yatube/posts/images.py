@@ -0,0 +1,132 @@
+"""Адаптивные варианты картинок постов для `<picture>` и `srcset`.
+
+Для каждой картинки строятся несколько ширин карточки в WebP и AVIF
+(если их умеет текущая сборка Pillow) и в исходном формате. Описание
+вариантов сохраняется в `Post.image_variants`, поэтому шаблону не нужно
+обращаться к хранилищу: он выводит `<source>` по готовому списку.
+"""
+import json
+from hashlib import md5
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from . import sharding
+from .models import Post
+
+# Ширины карточки поста; высота следует пропорции миниатюры 960x339.
+CARD_WIDTH = 960
+WIDTHS = (480, CARD_WIDTH, 1440)
+ASPECT = 339 / CARD_WIDTH
+# Параметры кодирования: качество подобрано под фотографии в ленте.
+ENCODERS = {
+    'AVIF': ('image/avif', 'avif', {'quality': 50}),
+    'WEBP': ('image/webp', 'webp', {'quality': 80, 'method': 4}),
+    'JPEG': ('image/jpeg', 'jpg', {'quality': 80, 'progressive': True}),
+    'PNG': ('image/png', 'png', {'optimize': True}),
+}
+# Порядок `<source>`: браузер берёт первый понятный ему формат.
+PREFERENCE = ('AVIF', 'WEBP', 'JPEG', 'PNG')
+
+
+def modern_formats():
+    """Современные форматы, которые умеет записывать установленный Pillow."""
+    Image.init()
+    formats = []
+    if 'AVIF' in Image.SAVE:
+        formats.append('AVIF')
+    if features.check('webp'):
+        formats.append('WEBP')
+    return formats
+
+
+def fallback_format(original_format):
+    """Исходный формат для старых браузеров; GIF и прочие — в PNG."""
+    return original_format if original_format in ('JPEG', 'PNG') else 'PNG'
+
+
+def widths_for(image):
+    """Ширины без увеличения исходника; хотя бы одна есть всегда."""
+    widths = [width for width in WIDTHS if width <= image.width]
+    return widths or [WIDTHS[0]]
+
+
+def encode(image, image_format, **overrides):
+    options = {**ENCODERS[image_format][2], **overrides}
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def variant_name(source_name, width, image_format):
+    digest = md5(source_name.encode()).hexdigest()
+    extension = ENCODERS[image_format][1]
+    return f'variants/{digest[:2]}/{digest}/{width}.{extension}'
+
+
+def render_variants(image_file, formats=None):
+    """Кодирует все варианты; возвращает пары (описание, байты)."""
+    with Image.open(image_file) as source:
+        original_format = source.format
+        source = ImageOps.exif_transpose(source)
+    alpha = 'A' in source.getbands() or 'transparency' in source.info
+    source = source.convert('RGBA' if alpha else 'RGB')
+    formats = formats or (
+        modern_formats() + [fallback_format(original_format)])
+    for width in widths_for(source):
+        size = (width, round(width * ASPECT))
+        resized = ImageOps.fit(source, size, Image.LANCZOS)
+        for image_format in formats:
+            data = encode(resized, image_format)
+            yield {
+                'format': image_format,
+                'width': size[0],
+                'height': size[1],
+                'bytes': len(data),
+            }, data
+
+
+def generate(name, storage=default_storage):
+    """Пишет варианты картинки в хранилище и запоминает их в постах."""
+    variants = []
+    with storage.open(name) as image_file:
+        for variant, data in render_variants(image_file):
+            variant['name'] = variant_name(
+                name, variant['width'], variant['format'])
+            storage.delete(variant['name'])
+            storage.save(variant['name'], ContentFile(data))
+            variant['url'] = storage.url(variant['name'])
+            variants.append(variant)
+    for posts in sharding.spread(Post.objects.filter(image=name)):
+        posts.update(image_variants=json.dumps(variants))
+    return variants
+
+
+def picture(variants):
+    """Данные для `<picture>`: `<source>` по форматам и запасной `<img>`."""
+    by_format = {}
+    for variant in sorted(variants, key=lambda variant: variant['width']):
+        by_format.setdefault(variant['format'], []).append(variant)
+    sources = [
+        {
+            'type': ENCODERS[image_format][0],
+            'srcset': ', '.join(
+                f'{variant["url"]} {variant["width"]}w'
+                for variant in by_format[image_format]),
+        }
+        for image_format in PREFERENCE if image_format in by_format
+    ]
+    if not sources:
+        return None
+    # Последний по предпочтению формат понимают все браузеры.
+    fallback = by_format[[f for f in PREFERENCE if f in by_format][-1]]
+    return {
+        'sources': sources[:-1],
+        'srcset': sources[-1]['srcset'],
+        'img': min(fallback, key=lambda variant: abs(
+            variant['width'] - CARD_WIDTH)),
+    }
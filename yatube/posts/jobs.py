@@ -0,0 +1,229 @@
+"""Очередь фоновых задач в базе.
+
+Побочные эффекты записи — ленты подписчиков, поисковый индекс,
+счётчики, миниатюры и варианты картинок — ставятся в очередь `Job`, и
+запрос не ждёт их выполнения. Задачи выполняет пул потоков
+веб-сервера (JOBS_WORKERS) или команда `run_workers`. Задача — функция,
+зарегистрированная `@task('имя')`, с аргументами в JSON.
+
+Ключ идемпотентности не даёт выполнить одну работу дважды: повторная
+постановка с тем же ключом ничего не делает. Упавшая задача
+повторяется с растущей задержкой, после MAX_ATTEMPTS попыток остаётся
+с ошибкой. С JOBS_EAGER задачи выполняются сразу при постановке, как
+до очереди: так по умолчанию вне боевого режима. Отложенные задачи
+(`deferred`) и тогда идут через очередь: картинки и раньше
+обрабатывались в фоне.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from time import perf_counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core import metrics
+
+from .models import Job
+
+MAX_ATTEMPTS = 5
+# Задержка перед повтором: BACKOFF, 2 * BACKOFF, 4 * BACKOFF...
+BACKOFF = timedelta(seconds=5)
+MAX_BACKOFF = timedelta(minutes=10)
+# Задача в работе дольше этого срока считается брошенной.
+STALE_AFTER = timedelta(minutes=10)
+# Столько хранятся выполненные задачи и их ключи.
+KEEP_DONE = timedelta(days=1)
+CLAIM_BATCH = 10
+
+JOBS = metrics.Counter(
+    'yatube_jobs_total',
+    'Выполненные фоновые задачи по имени и результату')
+JOB_SECONDS = metrics.Histogram(
+    'yatube_job_duration_seconds', 'Время выполнения фоновой задачи')
+JOB_LAG = metrics.Histogram(
+    'yatube_job_lag_seconds',
+    'Ожидание фоновой задачи в очереди до начала выполнения')
+
+logger = logging.getLogger(__name__)
+TASKS = {}
+DEFERRED = set()
+_executor = None
+_serving = False
+
+
+def task(name, deferred=False):
+    """Регистрирует функцию как задачу очереди под именем `name`.
+
+    `deferred` — задача всегда идёт через очередь, даже с JOBS_EAGER.
+    """
+    def decorator(function):
+        TASKS[name] = function
+        if deferred:
+            DEFERRED.add(name)
+        return function
+    return decorator
+
+
+def is_eager():
+    return getattr(settings, 'JOBS_EAGER', False)
+
+
+def enqueue(name, *args, key=None, **kwargs):
+    """Ставит задачу `name`; с тем же `key` повторная постановка ничего
+    не делает. Возвращает ключ задачи.
+    """
+    return push(name, args, kwargs, key)
+
+
+def push(name, args=(), kwargs=None, key=None, again=False, wake=True):
+    """`enqueue` с настройками постановки.
+
+    `again` — выполненная задача с тем же ключом ставится снова, `wake`
+    — будить пул потоков процесса.
+    """
+    function = TASKS[name]
+    kwargs = kwargs or {}
+    if is_eager() and name not in DEFERRED:
+        function(*args, **kwargs)
+        return key
+    key = key or f'{name}:{uuid4().hex}'
+    payload = json.dumps(
+        {'args': args, 'kwargs': kwargs}, cls=DjangoJSONEncoder)
+    if again:
+        Job.objects.filter(key=key, status=Job.DONE).update(
+            status=Job.PENDING, attempts=0, payload=payload,
+            run_after=timezone.now(), updated=timezone.now())
+    Job.objects.bulk_create(
+        [Job(name=name, key=key, payload=payload)], ignore_conflicts=True)
+    if wake:
+        transaction.on_commit(start_workers)
+    return key
+
+
+def serve():
+    """Разрешает пул потоков: его запускает только процесс веб-сервера.
+
+    Тесты, shell и команды пула не заводят, их очередь разбирает
+    `run_workers`: потоки переживали бы тест и мешали очистке базы.
+    """
+    global _serving
+    _serving = True
+
+
+def start_workers():
+    """Будит пул потоков; JOBS_WORKERS = 0 оставляет всё `run_workers`."""
+    global _executor
+    workers = getattr(settings, 'JOBS_WORKERS', 2)
+    if not workers or not _serving:
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='jobs')
+    _executor.submit(work)
+
+
+def is_pending(key):
+    """Ждёт ли задача с ключом `key` выполнения."""
+    return Job.objects.filter(
+        key=key, status__in=(Job.PENDING, Job.RUNNING)).exists()
+
+
+def work():
+    try:
+        return run_pending()
+    except Exception:
+        logger.exception('Сбой обработчика фоновых задач')
+        return 0
+    finally:
+        connections.close_all()
+
+
+def claim():
+    """Забирает готовую к запуску задачу; условный UPDATE защищает от
+    гонок между обработчиками.
+    """
+    now = timezone.now()
+    pending = Job.objects.filter(
+        status=Job.PENDING, run_after__lte=now).values_list('pk', flat=True)
+    for pk in pending[:CLAIM_BATCH]:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            updated=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи, пока они есть; возвращает их число."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim()
+        if job is None:
+            break
+        process(job)
+        processed += 1
+    return processed
+
+
+def backoff(attempts):
+    return min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def process(job):
+    jobs = Job.objects.filter(pk=job.pk)
+    JOB_LAG.observe(
+        max((timezone.now() - job.run_after).total_seconds(), 0),
+        name=job.name)
+    started = perf_counter()
+    try:
+        payload = json.loads(job.payload)
+        with transaction.atomic():
+            TASKS[job.name](*payload['args'], **payload['kwargs'])
+    except Exception as error:
+        failed = job.attempts >= MAX_ATTEMPTS
+        logger.warning('Задача %s не выполнена (попытка %d): %s',
+                       job, job.attempts, error)
+        jobs.update(
+            status=Job.FAILED if failed else Job.PENDING,
+            error=str(error),
+            run_after=timezone.now() + backoff(job.attempts),
+            updated=timezone.now(),
+        )
+        JOBS.inc(name=job.name, result='failed' if failed else 'retry')
+        return False
+    finally:
+        JOB_SECONDS.observe(perf_counter() - started, name=job.name)
+    jobs.update(status=Job.DONE, error='', updated=timezone.now())
+    JOBS.inc(name=job.name, result='done')
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи упавших обработчиков."""
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        updated__lt=timezone.now() - STALE_AFTER,
+    ).update(status=Job.PENDING, updated=timezone.now())
+
+
+def purge():
+    """Удаляет старые выполненные задачи; их ключи снова свободны."""
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE, updated__lt=timezone.now() - KEEP_DONE).delete()
+    return deleted
+
+
+def stats():
+    """Число задач в очереди по статусам."""
+    counts = dict(Job.objects.order_by().values_list('status').annotate(
+        Count('pk')))
+    return {status: counts.get(status, 0) for status, _ in Job.STATUSES}
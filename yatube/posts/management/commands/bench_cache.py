@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmarks import caches, results
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает долю попаданий и задержки бэкендов кеша, когда '
+            'к нему обращаются несколько процессов сразу')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', nargs='+', choices=list(caches.BACKENDS),
+            default=list(caches.BACKENDS))
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=1)
+        for name, value in caches.OPTIONS.items():
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=type(value),
+                default=value)
+        parser.add_argument('--output', help='Куда сохранить JSON')
+
+    def handle(self, *args, **options):
+        bench = {name: options[name] for name in caches.OPTIONS}
+        rows = {}
+        self.stdout.write(
+            f'{"backend":<10} {"попадания":>9} {"get p50":>8} '
+            f'{"get p95":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"rps":>8}')
+        for name in options['backends']:
+            row = rows[name] = caches.run(
+                name, options['processes'], bench, options['seed'])
+            self.stdout.write(
+                f'{name:<10} {row["hit_rate"]:9.1%} '
+                f'{row["get_p50_ms"]:8.3f} {row["get_p95_ms"]:8.3f} '
+                f'{row["p50_ms"]:8.2f} {row["p95_ms"]:8.2f} '
+                f'{row["p99_ms"]:8.2f} {row["rps"]:8.1f}')
+        if options['output']:
+            run = {'processes': options['processes'], 'seed': options['seed']}
+            results.save(options['output'], {**run, **bench}, rows)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
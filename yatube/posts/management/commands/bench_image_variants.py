@@ -0,0 +1,97 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageFilter, ImageOps
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import images
+from posts.utils import TOP_TEN
+
+# Ширина картинки в пикселях устройства для типичных экранов.
+CLIENTS = (
+    ('телефон 360px, 2x', 720),
+    ('ноутбук 960px, 1x', 960),
+    ('ноутбук 960px, 2x', 1920),
+)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет стоимость кодирования вариантов картинки и объём '
+            'картинок на странице ленты по сравнению с одной миниатюрой')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--image', help='Путь к картинке, по умолчанию синтетическое фото')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        source = self.load(options['image'])
+        formats = images.modern_formats() + ['JPEG']
+        self.stdout.write(
+            f'Исходник {source.width}x{source.height}, '
+            f'форматы: {", ".join(formats)}')
+
+        baseline_ms, baseline = self.measure(
+            source, images.CARD_WIDTH, 'JPEG', options['repeat'],
+            quality=sorl_settings.THUMBNAIL_QUALITY)
+        self.stdout.write(
+            f'  миниатюра sorl JPEG {images.CARD_WIDTH}: '
+            f'{baseline_ms:7.1f} мс {baseline:8d} байт')
+
+        sizes = {}
+        total_ms = 0
+        for width in images.widths_for(source):
+            for image_format in formats:
+                ms, size = self.measure(
+                    source, width, image_format, options['repeat'])
+                sizes[width, image_format] = size
+                total_ms += ms
+                self.stdout.write(
+                    f'  {image_format:<5} {width:>5}: '
+                    f'{ms:7.1f} мс {size:8d} байт')
+        self.stdout.write(
+            f'Все варианты одной картинки: {total_ms:.1f} мс '
+            f'против {baseline_ms:.1f} мс на миниатюру')
+
+        self.stdout.write(f'Байт картинок на странице из {TOP_TEN} постов:')
+        best = formats[0]
+        for title, device_width in CLIENTS:
+            width = self.pick(sizes, best, device_width)
+            served = sizes[width, best] * TOP_TEN
+            self.stdout.write(
+                f'  {title:<20} {best} {width:>5}: {served:9d} '
+                f'(было {baseline * TOP_TEN}, '
+                f'{served / (baseline * TOP_TEN):.0%})')
+
+    @staticmethod
+    def load(path):
+        if path:
+            with Image.open(path) as image:
+                return ImageOps.exif_transpose(image).convert('RGB')
+        # Шум с размытием похож на фотографию сильнее, чем заливка.
+        noise = Image.effect_noise((1920, 1080), 64).filter(
+            ImageFilter.GaussianBlur(2))
+        gradient = Image.linear_gradient('L').resize((1920, 1080))
+        return Image.merge('RGB', (noise, gradient, noise.rotate(180)))
+
+    @staticmethod
+    def measure(source, width, image_format, repeat, **encoder_options):
+        """Медиана времени ресайза и кодирования, размер результата."""
+        timings = []
+        for _ in range(max(repeat, 1)):
+            started = perf_counter()
+            resized = ImageOps.fit(
+                source, (width, round(width * images.ASPECT)),
+                Image.LANCZOS)
+            data = images.encode(resized, image_format, **encoder_options)
+            timings.append((perf_counter() - started) * 1000)
+        return median(timings), len(data)
+
+    @staticmethod
+    def pick(sizes, image_format, device_width):
+        """Вариант, который выберет браузер по srcset."""
+        widths = sorted(
+            width for width, fmt in sizes if fmt == image_format)
+        return next(
+            (width for width in widths if width >= device_width), widths[-1])
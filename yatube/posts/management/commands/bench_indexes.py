@@ -0,0 +1,117 @@
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from posts.models import Comment, Follow, Group, Post, User
+
+INDEXES = (
+    'post_pub_date_idx',
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+)
+# На SQLite ограничение уникальности — часть таблицы, и DROP INDEX его
+# не снимает: такие таблицы подменяются копией без ограничений.
+CONSTRAINED = (
+    (Follow, 'unique_follow'),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает планы и время запросов лент '
+            'с составными индексами и без них')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Сколько раз выполнять каждый запрос',
+        )
+
+    def handle(self, *args, **options):
+        queries = self.queries()
+        if not queries:
+            self.stderr.write('В базе нет данных для замеров')
+            return
+        self.report('С индексами', queries, options['repeat'])
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for name in INDEXES:
+                        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+                    for model, constraint in CONSTRAINED:
+                        self.drop_constraints(cursor, model)
+                        self.stdout.write(
+                            f'{model._meta.db_table}: копия таблицы '
+                            f'без {constraint}')
+                self.report('Без индексов', queries, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    @staticmethod
+    def drop_constraints(cursor, model):
+        """Заменяет таблицу копией без ограничений с прежними индексами."""
+        table = model._meta.db_table
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' "
+            'AND tbl_name = %s AND sql IS NOT NULL', [table])
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f'CREATE TABLE "{table}_copy" AS SELECT * FROM "{table}"')
+        cursor.execute(f'DROP TABLE "{table}"')
+        cursor.execute(f'ALTER TABLE "{table}_copy" RENAME TO "{table}"')
+        for sql in indexes:
+            cursor.execute(sql)
+
+    def queries(self):
+        """Типичные запросы страниц для самых «тяжёлых» объектов базы."""
+        author = User.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        post = Post.objects.order_by('-comments_count').first()
+        follow = Follow.objects.first()
+        if not (author and post):
+            return {}
+        queries = {
+            'index': Post.objects.order_by('-pub_date', '-pk')[:11],
+            'profile': Post.objects.filter(
+                author=author).order_by('-pub_date', '-pk')[:11],
+            'comments': Comment.objects.filter(
+                post=post).order_by('-created', '-pk')[:21],
+        }
+        if group:
+            queries['group_list'] = Post.objects.filter(
+                group=group).order_by('-pub_date', '-pk')[:11]
+        if follow:
+            queries['following'] = Follow.objects.filter(
+                user=follow.user_id, author=follow.author_id)
+        return {
+            name: queryset.query.get_compiler(connection.alias).as_sql()
+            for name, queryset in queries.items()
+        }
+
+    @staticmethod
+    def fetch(cursor, sql, params):
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        with connection.cursor() as cursor:
+            for name, (sql, params) in queries.items():
+                # Комментарий с заголовком не даёт sqlite3 взять план
+                # из кеша подготовленных выражений после DROP INDEX.
+                cursor.execute(
+                    f'EXPLAIN QUERY PLAN {sql} /* {title} */', params)
+                plan = '; '.join(row[-1] for row in cursor.fetchall())
+                seconds = timeit(
+                    lambda: self.fetch(cursor, sql, params), number=repeat)
+                self.stdout.write(
+                    f'  {name:<12} {seconds / repeat * 1000:8.3f} мс  {plan}')
@@ -0,0 +1,108 @@
+import os
+import random
+import sqlite3
+import tempfile
+from itertools import accumulate
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from faker.providers.lorem.ru_RU import Provider
+
+BATCH_SIZE = 10000
+WORDS_PER_POST = 30
+# Словоформы расширяют словарь Faker до размеров живого языка.
+ENDINGS = (
+    '', 'а', 'у', 'ом', 'е', 'ы', 'ов', 'ам', 'ами', 'ах',
+    'ой', 'ую', 'ее', 'ие', 'их', 'им', 'ыми', 'ость', 'ение', 'ник',
+)
+SCHEMA = (
+    'CREATE TABLE posts_post ('
+    'id INTEGER PRIMARY KEY, text TEXT NOT NULL, pub_date INTEGER NOT NULL)',
+    'CREATE INDEX post_pub_date_idx ON posts_post (pub_date DESC, id DESC)',
+    'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+    "text, tokenize = 'unicode61 remove_diacritics 2')",
+)
+LIKE_SQL = (
+    'SELECT id FROM posts_post WHERE text LIKE ? '
+    'ORDER BY pub_date DESC, id DESC LIMIT 10'
+)
+FTS_SQL = (
+    'SELECT posts_post.id FROM posts_post '
+    'JOIN posts_post_fts ON posts_post.id = posts_post_fts.rowid '
+    'WHERE posts_post_fts.text MATCH ? '
+    'ORDER BY bm25(posts_post_fts) LIMIT 10'
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск через FTS5 и через LIKE на сгенерированных '
+            'постах во временной базе SQLite')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        words = list({
+            word + ending
+            for word in Provider.word_list for ending in ENDINGS
+        })
+        rnd.shuffle(words)
+        # Частоты слов по закону Ципфа, как в живых текстах.
+        weights = list(
+            accumulate(1 / rank for rank in range(1, len(words) + 1)))
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'bench.sqlite3'))
+            for statement in SCHEMA:
+                db.execute(statement)
+            started = perf_counter()
+            self.generate(db, rnd, words, weights, options['posts'])
+            self.stdout.write(
+                f'Сгенерировано постов: {options["posts"]} '
+                f'за {perf_counter() - started:.1f} с')
+            started = perf_counter()
+            db.execute(
+                'INSERT INTO posts_post_fts (rowid, text) '
+                'SELECT id, text FROM posts_post')
+            db.commit()
+            self.stdout.write(
+                f'Индекс FTS5 построен за {perf_counter() - started:.1f} с')
+            for title, sample in (
+                ('частые слова', words[:10]),
+                ('редкие слова', words[-len(words) // 2:]),
+            ):
+                queries = [rnd.choice(sample)
+                           for _ in range(options['queries'])]
+                like = self.measure(
+                    db, LIKE_SQL, [f'%{word}%' for word in queries])
+                fts = self.measure(
+                    db, FTS_SQL, [f'"{word}"' for word in queries])
+                self.stdout.write(
+                    f'{title}: LIKE {like:.2f} мс, FTS5 {fts:.2f} мс, '
+                    f'LIKE / FTS5 = {like / fts:.1f}')
+            db.close()
+
+    def generate(self, db, rnd, words, weights, total):
+        for start in range(0, total, BATCH_SIZE):
+            db.executemany(
+                'INSERT INTO posts_post (id, text, pub_date) '
+                'VALUES (?, ?, ?)',
+                (
+                    (pk, ' '.join(rnd.choices(
+                        words, cum_weights=weights, k=WORDS_PER_POST)),
+                     pk)
+                    for pk in range(
+                        start + 1, min(start + BATCH_SIZE, total) + 1)
+                ),
+            )
+        db.commit()
+
+    @staticmethod
+    def measure(db, sql, params):
+        """Среднее время запроса в миллисекундах."""
+        started = perf_counter()
+        for param in params:
+            db.execute(sql, [param]).fetchall()
+        return (perf_counter() - started) / len(params) * 1000
@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from core import db
+from posts.benchmarks import database, dataset, results
+
+# Настройки «как было» и с PRAGMA и постоянными соединениями.
+PROFILES = {
+    'default': {'pragmas': {}, 'conn_max_age': 0},
+    'tuned': {'pragmas': db.PRAGMAS, 'conn_max_age': 60},
+}
+SIZES = {'users': 50, 'groups': 5, 'posts': 500, 'comments': 500,
+         'follows': 100}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLite без настройки и с PRAGMA из core.db под '
+            'смешанной нагрузкой: чтение ленты и запись комментариев')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5.0,
+            help='Секунд нагрузки на каждый профиль')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Куда сохранить JSON')
+
+    def handle(self, *args, **options):
+        rows = {}
+        for name, profile in PROFILES.items():
+            with tempfile.TemporaryDirectory() as directory:
+                with override_settings(SQLITE_PRAGMAS=profile['pragmas']):
+                    dataset.use_database(
+                        os.path.join(directory, 'bench.sqlite3'),
+                        CONN_MAX_AGE=profile['conn_max_age'])
+                    dataset.seed(SIZES, options['seed'])
+                    rows[name] = database.run(
+                        options['readers'], options['writers'],
+                        options['duration'], options['seed'])
+                connections.close_all()
+            self.report(name, rows[name])
+        if options['output']:
+            run = {name: options[name]
+                   for name in ('readers', 'writers', 'duration', 'seed')}
+            results.save(options['output'], run, rows)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+    def report(self, name, row):
+        for kind, values in row.items():
+            self.stdout.write(
+                f'{name:<8} {kind:<6} {values["ops_per_s"]:8.1f} оп/с  '
+                f'p50 {values["p50_ms"]:7.2f}  p95 {values["p95_ms"]:7.2f}  '
+                f'p99 {values["p99_ms"]:7.2f} мс  '
+                f'ошибок {values["errors"]}')
@@ -0,0 +1,62 @@
+import os
+import random
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.benchmarks import dataset, results, runner, templates
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время отрисовки каждого шаблона страницы с диска, '
+            'через cached.Loader и после прогрева и пишет итоги в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            help='Файл SQLite для замеров, по умолчанию временный')
+        parser.add_argument('--seed', type=int, default=1)
+        for name, size in dataset.SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=size)
+        parser.add_argument(
+            '--renders', type=int, default=200,
+            help='Отрисовок каждого шаблона в каждом режиме')
+        parser.add_argument(
+            '--modes', nargs='+', choices=templates.MODES,
+            default=list(templates.MODES))
+        parser.add_argument('--output', help='Куда сохранить JSON')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = options['database'] or os.path.join(
+                directory, 'bench.sqlite3')
+            dataset.use_database(path)
+            data = self.prepare(options)
+            paths = runner.targets(data, random.Random(options['seed']))
+            rows = templates.run(
+                paths, data.reader, options['renders'], options['modes'])
+            connections.close_all()
+        self.report(rows)
+        if options['output']:
+            run = {name: options[name] for name in ('seed', 'renders')}
+            run['sizes'] = {name: options[name] for name in dataset.SIZES}
+            results.save(options['output'], run, rows)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+    def prepare(self, options):
+        if Post.objects.exists():
+            self.stdout.write('База уже заполнена, используем её данные')
+            return dataset.load()
+        sizes = {name: options[name] for name in dataset.SIZES}
+        self.stdout.write(f'Заполняем базу: {sizes}')
+        return dataset.seed(sizes, options['seed'])
+
+    def report(self, rows):
+        self.stdout.write(
+            f'{"шаблон":<42} {"первая":>8} {"p50":>8} {"p95":>8}')
+        for key, row in rows.items():
+            self.stdout.write(
+                f'{key:<42} {row["first_ms"]:8.2f} {row["p50_ms"]:8.2f} '
+                f'{row["p95_ms"]:8.2f}')
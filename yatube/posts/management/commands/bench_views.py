@@ -0,0 +1,105 @@
+import os
+import random
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from posts.benchmarks import dataset, results, runner
+from posts.models import Post
+
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Заполняет отдельную базу воспроизводимыми данными, гоняет URL '
+            'представлений и пишет p50/p95/p99, пропускную способность и '
+            'число SQL-запросов в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            help='Файл SQLite для замеров, по умолчанию временный')
+        parser.add_argument('--seed', type=int, default=1)
+        for name, size in dataset.SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=size)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Обращений к каждому представлению')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--mode', choices=('client', 'wsgi'), default='client',
+            help='Тестовый клиент или локальный WSGI-сервер')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Без кеша: замеряются сами представления')
+        parser.add_argument('--output', help='Куда сохранить JSON')
+        parser.add_argument('--baseline', help='JSON прошлого прогона')
+        parser.add_argument('--tolerance', type=float, default=0.2)
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Завершиться с ошибкой, если есть регрессии')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = options['database'] or os.path.join(
+                directory, 'bench.sqlite3')
+            dataset.use_database(path)
+            data = self.prepare(options)
+            paths = runner.targets(data, random.Random(options['seed']))
+            fetcher = (runner.WsgiFetcher if options['mode'] == 'wsgi'
+                       else runner.ClientFetcher)
+            caches = DUMMY_CACHES if options['cold'] else None
+            with override_settings(**({'CACHES': caches} if caches else {})):
+                with fetcher(data.reader) as fetch:
+                    views = runner.run(
+                        paths, fetch, options['requests'],
+                        options['concurrency'], options['warmup'])
+            connections.close_all()
+        self.report(views)
+        if options['output']:
+            results.save(options['output'], self.run_options(options), views)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+        if options['baseline']:
+            self.compare(views, options)
+
+    def prepare(self, options):
+        if Post.objects.exists():
+            self.stdout.write('База уже заполнена, используем её данные')
+            return dataset.load()
+        sizes = {name: options[name] for name in dataset.SIZES}
+        self.stdout.write(f'Заполняем базу: {sizes}')
+        return dataset.seed(sizes, options['seed'])
+
+    @staticmethod
+    def run_options(options):
+        names = ('seed', 'requests', 'concurrency', 'warmup', 'mode', 'cold')
+        run = {name: options[name] for name in names}
+        run['sizes'] = {name: options[name] for name in dataset.SIZES}
+        return run
+
+    def report(self, views):
+        self.stdout.write(
+            f'{"view":<20} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"rps":>8} {"SQL":>6} {"ошибки":>6}')
+        for view, row in views.items():
+            self.stdout.write(
+                f'{view:<20} {row["p50_ms"]:8.2f} {row["p95_ms"]:8.2f} '
+                f'{row["p99_ms"]:8.2f} {row["rps"]:8.1f} '
+                f'{row["queries"]:6.1f} {row["errors"]:6d}')
+
+    def compare(self, views, options):
+        baseline = results.load(options['baseline'])['views']
+        rows = results.compare(views, baseline, options['tolerance'])
+        regressions = [row for row in rows if row[-1]]
+        for view, metric, old, new, change, regression in rows:
+            line = (f'{view:<20} {metric:<8} {old:>10} -> {new:<10} '
+                    f'{change:+.0%}')
+            self.stdout.write(
+                self.style.ERROR(line) if regression else line)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'Регрессий: {len(regressions)}')
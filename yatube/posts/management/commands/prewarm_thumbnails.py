@@ -0,0 +1,28 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь миниатюры всех картинок постов, которых ещё '
+            'нет, и выполняет очередь командой run_workers')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько потоков выполняют очередь',
+        )
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').values_list(
+            'image', flat=True).distinct()
+        scheduled = sum(
+            thumbnails.schedule_image(image, wake=False)
+            for image in images.iterator()
+        )
+        self.stdout.write(f'Поставлено в очередь: {scheduled}')
+        call_command(
+            'run_workers', once=True, workers=options['workers'],
+            stdout=self.stdout)
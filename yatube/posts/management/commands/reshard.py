@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from posts import resharding, sharding
+from posts.models import Post, ShardAssignment, User
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты и комментарии авторов в другой шард, '
+            'не останавливая сайт')
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*')
+        parser.add_argument('--to', dest='target', help='Шард назначения')
+        parser.add_argument(
+            '--rebalance', action='store_true',
+            help='Каждого автора — в шард по хешу его id')
+        parser.add_argument(
+            '--batch-size', type=int, default=resharding.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not sharding.is_sharded():
+            raise CommandError(
+                'Шард один — переносить некуда, см. YATUBE_SHARDS')
+        if options['rebalance'] == bool(options['usernames']):
+            raise CommandError('Укажите авторов и --to или только --rebalance')
+        if options['rebalance']:
+            moves = self.rebalanced()
+        else:
+            if options['target'] not in sharding.shards():
+                raise CommandError(
+                    f'Шард назначения — один из {sharding.shards()}')
+            moves = [
+                (author_id, options['target'])
+                for author_id in self.authors(options['usernames'])
+            ]
+        for author_id, target in moves:
+            source = sharding.author_shard(author_id)
+            moved = resharding.move_author(
+                author_id, target, options['batch_size'])
+            self.stdout.write(
+                f'{author_id}: {source} → {target}, постов {moved}')
+
+    def authors(self, usernames):
+        ids = dict(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        missing = set(usernames) - set(ids)
+        if missing:
+            raise CommandError(f'Нет пользователей: {", ".join(missing)}')
+        return [ids[username] for username in usernames]
+
+    def rebalanced(self):
+        """Авторы, чей шард не совпадает с шардом по хешу."""
+        authors = set(ShardAssignment.objects.values_list(
+            'author_id', flat=True))
+        authors.update(Post.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'author_id', flat=True).distinct())
+        return [
+            (author_id, sharding.hashed_shard(author_id))
+            for author_id in sorted(authors)
+            if sharding.author_shard(author_id)
+            != sharding.hashed_shard(author_id)
+        ]
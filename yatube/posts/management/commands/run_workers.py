@@ -0,0 +1,86 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import jobs
+
+
+def drain(batch):
+    """Обработчик пула: своё соединение с базой на каждый проход."""
+    try:
+        return jobs.run_pending(batch)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди пулом потоков или '
+            'процессов, пока не будет остановлена')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число одновременно работающих обработчиков')
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Процессы вместо потоков: для задач, нагружающих CPU')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти')
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument(
+            '--batch', type=int, default=50,
+            help='Задач за один проход обработчика')
+
+    def handle(self, *args, **options):
+        requeued = jobs.requeue_stale()
+        purged = jobs.purge()
+        self.stdout.write(
+            f'Возвращено в очередь: {requeued}, удалено старых: {purged}')
+        workers = max(options['workers'], 1)
+        processed = 0
+        try:
+            if workers == 1 and not options['processes']:
+                processed = self.loop(
+                    lambda: jobs.run_pending(options['batch']), options)
+            else:
+                with self.pool(workers, options['processes']) as pool:
+                    batches = [options['batch']] * workers
+                    processed = self.loop(
+                        lambda: sum(pool.map(drain, batches)), options)
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлено')
+        self.report(processed)
+
+    def pool(self, workers, processes):
+        if processes:
+            # Дочерние процессы не должны делить соединения родителя.
+            connections.close_all()
+            return ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('fork'))
+        return ThreadPoolExecutor(workers, thread_name_prefix='jobs')
+
+    def loop(self, step, options):
+        """Проходы по очереди, пока она не опустеет или до остановки."""
+        processed = 0
+        while True:
+            done = step()
+            processed += done
+            if not done:
+                if options['once']:
+                    return processed
+                time.sleep(options['poll'])
+
+    def report(self, processed):
+        self.stdout.write(f'Выполнено задач: {processed}')
+        for status, count in jobs.stats().items():
+            self.stdout.write(f'{status:<10} {count}')
+        # Метрики пула процессов остаются в дочерних процессах.
+        for metric in (jobs.JOBS, jobs.JOB_SECONDS, jobs.JOB_LAG):
+            for line in metric.render():
+                self.stdout.write(line)
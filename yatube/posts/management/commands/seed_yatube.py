@@ -0,0 +1,78 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import cache
+from posts.benchmarks import bulk
+
+
+class Command(BaseCommand):
+    help = ('Быстро заполняет базу реалистичными данными через bulk_create: '
+            'степенное распределение подписчиков и постов по авторам, '
+            'всплески комментариев у популярных постов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=50000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней разбросаны посты')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.BATCH_SIZE)
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько картинок сгенерировать для постов')
+        parser.add_argument(
+            '--image-share', type=float, default=0.1,
+            help='Доля постов с картинкой')
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не строить ленты подписок')
+        parser.add_argument(
+            '--skip-search', action='store_true',
+            help='Не заполнять поисковый индекс')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        seeder = bulk.Seeder(
+            seed=options['seed'], batch_size=options['batch_size'],
+            days=options['days'], log=self.stdout.write)
+        started = perf_counter()
+        try:
+            self.step('Пользователей', seeder.users, options['users'])
+        except ValueError as error:
+            raise CommandError(f'{error}, выберите другой --seed')
+        self.step('Групп', seeder.groups, options['groups'])
+        self.step('Подписок', seeder.follows, options['follows'])
+        if options['images']:
+            self.step('Картинок', seeder.make_images, options['images'])
+        self.step(
+            'Постов и комментариев', seeder.posts_and_comments,
+            options['posts'], options['comments'], options['image_share'])
+        self.step('Счётчиков', seeder.user_counters)
+        if not options['skip_timelines']:
+            self.step('Записей в лентах', seeder.timelines)
+        if not options['skip_search']:
+            self.step('Постов в поисковом индексе', seeder.search_index)
+        cache.bump(*cache.index_scopes())
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {perf_counter() - started:.1f} с'))
+        if seeder.images:
+            self.stdout.write(
+                'Миниатюры создаст prewarm_thumbnails или первый показ')
+
+    def step(self, title, action, *args):
+        started = perf_counter()
+        count = action(*args)
+        elapsed = perf_counter() - started
+        if count is None:
+            self.stdout.write(f'{title}: {elapsed:.1f} с')
+            return
+        self.stdout.write(
+            f'{title}: {count} за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-9):.0f} в секунду)')
@@ -0,0 +1,126 @@
+"""Перенос авторов между шардами без остановки сайта.
+
+Посты автора и комментарии к ним сначала копируются пачками, пока
+сайт пишет в старый шард. Затем под блокировкой записи старого шарда
+докопируется разница, автор переключается на новый шард, а старые
+строки удаляются в той же транзакции. Id не меняются, поэтому ссылки,
+ленты подписок и кеш страниц остаются верными.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import search, sharding
+from .models import Comment, Group, Post, User
+from .utils import explicit_dates
+
+BATCH_SIZE = 500
+# Столько раз подбираются посты, записанные в старый шард по
+# устаревшему кешу уже после переключения.
+SWEEPS = 3
+POST_FIELDS = ('group', 'text', 'image', 'image_variants', 'comments_count')
+COMMENT_FIELDS = ('text',)
+
+
+@contextmanager
+def locked(alias):
+    """Транзакция, с первого запроса держащая блокировку записи SQLite."""
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Post._meta.db_table} WHERE id < 0')
+        yield
+
+
+def batches(queryset, size):
+    """Строки по возрастанию id пачками, без OFFSET."""
+    last = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last).order_by('pk')[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1].pk
+
+
+def mirror(model, ids, target):
+    """Копирует в шард недостающие строки пользователей или групп."""
+    ids = sorted(ids - {None})
+    for start in range(0, len(ids), BATCH_SIZE):
+        model.objects.using(target).bulk_create(
+            model.objects.using(DEFAULT_DB_ALIAS).filter(
+                pk__in=ids[start:start + BATCH_SIZE]),
+            ignore_conflicts=True,
+        )
+
+
+def copy(model, rows, target, fields):
+    """Вставляет новые строки в шард и обновляет скопированные раньше."""
+    with explicit_dates():
+        model.objects.using(target).bulk_create(rows, ignore_conflicts=True)
+    model.objects.using(target).bulk_update(rows, fields)
+
+
+def sync(author_id, source, target, batch_size=BATCH_SIZE):
+    """Копирует посты автора и комментарии к ним; возвращает их id."""
+    post_ids, comment_ids = set(), set()
+    mirror(User, {author_id}, target)
+    posts = Post.objects.using(source).filter(author_id=author_id)
+    for rows in batches(posts, batch_size):
+        mirror(Group, {row.group_id for row in rows}, target)
+        copy(Post, rows, target, POST_FIELDS)
+        search.index_posts(rows, target)
+        post_ids.update(row.pk for row in rows)
+    comments = Comment.objects.using(source).filter(
+        post__author_id=author_id)
+    for rows in batches(comments, batch_size):
+        mirror(User, {row.author_id for row in rows}, target)
+        copy(Comment, rows, target, COMMENT_FIELDS)
+        comment_ids.update(row.pk for row in rows)
+    return post_ids, comment_ids
+
+
+def purge(alias, post_ids, comment_ids):
+    """Удаляет строки без сигналов: посты не удалены, а переехали."""
+    with connections[alias].cursor() as cursor:
+        for model, ids in ((Comment, comment_ids), (Post, post_ids)):
+            ids = sorted(ids)
+            for start in range(0, len(ids), BATCH_SIZE):
+                chunk = ids[start:start + BATCH_SIZE]
+                cursor.execute(
+                    f'DELETE FROM {model._meta.db_table} WHERE id IN '
+                    f'({", ".join(["%s"] * len(chunk))})',
+                    chunk,
+                )
+    search.unindex_posts(post_ids, alias)
+
+
+def move_author(author_id, target, batch_size=BATCH_SIZE):
+    """Переносит посты автора в шард `target`; возвращает их число."""
+    source = sharding.author_shard(author_id)
+    if source in (None, target):
+        return 0
+    copied_posts, copied_comments = sync(
+        author_id, source, target, batch_size)
+    moved = set()
+    for sweep in range(SWEEPS):
+        post_ids = set()
+        try:
+            with locked(source), \
+                    transaction.atomic(using=DEFAULT_DB_ALIAS), \
+                    transaction.atomic(using=target):
+                post_ids, comment_ids = sync(
+                    author_id, source, target, batch_size)
+                if sweep == 0:
+                    # Копии того, что удалили, пока шла первая копия.
+                    purge(target, copied_posts - post_ids,
+                          copied_comments - comment_ids)
+                elif not post_ids and not comment_ids:
+                    break
+                sharding.reassign(author_id, target, post_ids)
+                purge(source, post_ids, comment_ids)
+        except Exception:
+            # Кеш не должен указывать на шард, куда перенос не удался.
+            sharding.forget(author_id, post_ids)
+            raise
+        moved |= post_ids
+    return len(moved)
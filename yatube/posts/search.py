@@ -0,0 +1,105 @@
+"""Полнотекстовый поиск постов.
+
+На SQLite посты индексируются в виртуальной таблице FTS5
+`posts_post_fts` (rowid совпадает с id поста), результаты
+упорядочиваются по bm25. На других СУБД и на сборках SQLite без FTS5
+поиск сводится к `icontains`. У каждого шарда постов свой индекс.
+"""
+from functools import lru_cache
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.expressions import RawSQL
+
+from . import sharding
+from .models import Post, PostSearch
+
+TABLE = PostSearch._meta.db_table
+
+
+@lru_cache(maxsize=None)
+def is_supported(alias=DEFAULT_DB_ALIAS):
+    using = connections[alias]
+    if using.vendor != 'sqlite':
+        return False
+    with using.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки, последнее ищется по префиксу.
+    """
+    words = ['"{}"'.format(word.replace('"', '""')) for word in query.split()]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+def index_post(post):
+    index_posts([post], post._state.db or DEFAULT_DB_ALIAS)
+
+
+def unindex_post(post):
+    unindex_posts([post.pk], post._state.db or DEFAULT_DB_ALIAS)
+
+
+def index_posts(posts, using=DEFAULT_DB_ALIAS):
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [[post.pk] for post in posts])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [[post.pk, post.text] for post in posts])
+
+
+def unindex_posts(ids, using=DEFAULT_DB_ALIAS):
+    if is_supported(using):
+        with connections[using].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {TABLE} WHERE rowid = %s', [[pk] for pk in ids])
+
+
+def rebuild():
+    """Переиндексирует все посты; возвращает их число."""
+    for alias in sharding.shards():
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, text) SELECT id, text '
+                'FROM posts_post')
+            cursor.execute(
+                f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return sum(shard.count() for shard in sharding.spread(Post.objects.all()))
+
+
+def matching(query, queryset=None):
+    """Посты, подходящие под запрос, без оценки релевантности.
+
+    Такой queryset можно считать `count()`: bm25 SQLite разрешает только
+    в запросе, который сам читает совпадения FTS5.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not is_supported():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(search__text__match=expression)
+
+
+def search(query, queryset=None):
+    """Посты, подходящие под запрос, и поле, по убыванию которого их
+    упорядочивать: релевантность `score` или дата публикации.
+    """
+    posts = matching(query, queryset)
+    if not match_expression(query) or not is_supported():
+        return posts, 'pub_date'
+    # bm25 тем меньше, чем документ релевантнее; ключ курсора убывает.
+    return posts.annotate(score=RawSQL(f'-bm25({TABLE})', ())), 'score'
@@ -0,0 +1,326 @@
+"""Шардирование постов и комментариев по автору.
+
+Посты автора и комментарии к ним лежат в одной из баз POST_SHARDS.
+Шард новому автору выбирается по хешу id при первом посте и
+запоминается в `ShardAssignment` основной базы; дальше его меняет
+только команда `reshard`. Авторы без записи живут в основной базе —
+там все посты, написанные до шардирования.
+
+Пользователи, группы, подписки, ленты и счётчики остаются в основной
+базе. В шард копируются строки пользователей и групп, на которые
+ссылаются его посты и комментарии; сигналы держат копии в актуальном
+виде. Id постов и комментариев шарды выдают из непересекающихся
+последовательностей, см. `next_id`, поэтому id уникален во всех
+шардах и не меняется при переносе.
+
+Пока шард один — основная база, — функции модуля возвращают None
+и маршрутизация остаётся обычной.
+"""
+import zlib
+from collections import defaultdict
+from heapq import merge
+from itertools import islice
+from operator import attrgetter, itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F, Max
+
+from .models import Comment, IdSequence, Post, ShardAssignment, User
+
+CACHE_TIMEOUT = 60 * 60
+# Шардов не больше ID_STRIDE: остаток от деления id — номер шарда.
+ID_STRIDE = 64
+SHARDED = (Post, Comment)
+# Строки основной базы, на которые ссылаются записи в шарде.
+REFERENCES = {Post: ('author', 'group'), Comment: ('author',)}
+
+
+def shards():
+    return list(getattr(settings, 'POST_SHARDS', [DEFAULT_DB_ALIAS]))
+
+
+def is_sharded():
+    return len(shards()) > 1
+
+
+def spread(queryset):
+    """Тот же запрос к каждому шарду; без шардов — он сам."""
+    if not is_sharded():
+        return [queryset]
+    return [queryset.using(alias) for alias in shards()]
+
+
+def hashed_shard(author_id):
+    names = shards()
+    return names[zlib.crc32(str(author_id).encode()) % len(names)]
+
+
+def author_key(author_id):
+    return f'shard:author:{author_id}'
+
+
+def post_key(post_id):
+    return f'shard:post:{post_id}'
+
+
+def assigned_shard(author_id):
+    """Записанный шард автора или '' — автор ещё не закреплён."""
+    key = author_key(author_id)
+    alias = cache.get(key)
+    if alias is None:
+        alias = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(
+            author_id=author_id).values_list('shard', flat=True).first()
+        alias = alias or ''
+        cache.set(key, alias, CACHE_TIMEOUT)
+    return alias
+
+
+def author_shard(author_id):
+    """Шард с постами автора."""
+    if not is_sharded() or author_id is None:
+        return None
+    return assigned_shard(author_id) or DEFAULT_DB_ALIAS
+
+
+def username_shard(username):
+    if not is_sharded():
+        return None
+    return author_shard(User.objects.filter(
+        username=username).values_list('pk', flat=True).first())
+
+
+def assign(author_id):
+    """Шард для нового поста; при первом посте закрепляет его за автором."""
+    if not is_sharded():
+        return None
+    alias = assigned_shard(author_id)
+    if alias:
+        return alias
+    legacy = Post.objects.using(DEFAULT_DB_ALIAS).filter(
+        author_id=author_id).exists()
+    assignment, _ = ShardAssignment.objects.using(
+        DEFAULT_DB_ALIAS).get_or_create(
+            author_id=author_id,
+            defaults={'shard': (
+                DEFAULT_DB_ALIAS if legacy else hashed_shard(author_id))},
+    )
+    cache.set(author_key(author_id), assignment.shard, CACHE_TIMEOUT)
+    return assignment.shard
+
+
+def reassign(author_id, alias, post_ids=()):
+    """Переключает автора и его посты на шард `alias`."""
+    ShardAssignment.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        author_id=author_id, defaults={'shard': alias})
+    cache.set_many({
+        author_key(author_id): alias,
+        **{post_key(post_id): alias for post_id in post_ids},
+    }, CACHE_TIMEOUT)
+
+
+def forget(author_id, post_ids=()):
+    cache.delete_many([author_key(author_id), *map(post_key, post_ids)])
+
+
+def post_shard(post_id):
+    """Шард поста по его id; если поста нет нигде — основная база."""
+    if not is_sharded():
+        return None
+    key = post_key(post_id)
+    alias = cache.get(key)
+    if alias is None:
+        names = shards()
+        # Сначала шард, выдавший id: большинство постов не переносят.
+        issuer = names[int(post_id) % ID_STRIDE % len(names)]
+        names.sort(key=lambda name: name != issuer)
+        alias = next((
+            name for name in names
+            if Post.objects.using(name).filter(pk=post_id).exists()
+        ), None)
+        if alias is None:
+            return DEFAULT_DB_ALIAS
+        cache.set(key, alias, CACHE_TIMEOUT)
+    return alias
+
+
+def located(instance, write=False):
+    """Шард, где лежит или будет лежать объект-подсказка роутера."""
+    if isinstance(instance, Post):
+        if instance._state.adding:
+            return assign(instance.author_id)
+        return instance._state.db
+    if isinstance(instance, Comment):
+        if not instance._state.adding:
+            return instance._state.db
+        if Comment.post.is_cached(instance) and instance.post._state.db:
+            return instance.post._state.db
+        return post_shard(instance.post_id)
+    if isinstance(instance, User):
+        return assign(instance.pk) if write else author_shard(instance.pk)
+    return None
+
+
+def gather(queryset, key, stop, start=0, descending=True):
+    """Строки ленты [start:stop] со всех шардов.
+
+    Каждый шард отдаёт первые `stop` строк в порядке (key, pk), списки
+    сливаются k-way слиянием. Без шардов — обычный срез.
+    """
+    querysets = spread(queryset)
+    if len(querysets) == 1:
+        return list(queryset[start:stop])
+    rows = merge(
+        *(shard[:stop] for shard in querysets),
+        key=lambda row: (getattr(row, key), row.pk),
+        reverse=descending,
+    )
+    return list(islice(distinct(rows), start, stop))
+
+
+def stream(queryset, chunk_size, descending=True):
+    """Все строки `values_list` со всех шардов одним потоком.
+
+    Первые два поля строки — pk и ключ порядка, шарды уже упорядочены
+    по (ключ, pk). Память не растёт с числом строк: каждый шард читается
+    `iterator()`, а слияние держит по строке на шард.
+    """
+    iterators = [shard.iterator(chunk_size) for shard in spread(queryset)]
+    if len(iterators) == 1:
+        return iterators[0]
+    rows = merge(*iterators, key=itemgetter(1, 0), reverse=descending)
+    return distinct(rows, itemgetter(0))
+
+
+def distinct(rows, pk=attrgetter('pk')):
+    """Пропускает соседние повторы: пока автор переезжает, его посты
+    есть в обоих шардах.
+    """
+    previous = None
+    for row in rows:
+        if pk(row) != previous:
+            yield row
+        previous = pk(row)
+
+
+def in_bulk(queryset, authors):
+    """Посты по id из шардов их авторов; `authors` — {id поста: id автора}.
+    """
+    by_shard = defaultdict(list)
+    for post_id, author_id in authors.items():
+        by_shard[author_shard(author_id)].append(post_id)
+    posts = {}
+    for alias, ids in by_shard.items():
+        posts.update(queryset.using(alias).in_bulk(ids))
+    return posts
+
+
+def next_id(model, using):
+    """Id новой строки в шарде `using`, уникальный во всех шардах.
+
+    Младшие разряды id — номер шарда, старшие — счётчик `IdSequence`
+    в том же шарде: он откатывается вместе со строкой. Счётчик
+    начинается за самым большим id, уже записанным в любом шарде.
+    """
+    name = model._meta.label_lower
+    sequences = IdSequence.objects.using(using)
+    with transaction.atomic(using=using):
+        if sequences.filter(name=name).update(next_id=F('next_id') + 1):
+            number = sequences.values_list(
+                'next_id', flat=True).get(name=name) - 1
+        else:
+            number = 1 + max(
+                shard.aggregate(top=Max('pk'))['top'] or 0
+                for shard in spread(model._default_manager.all())
+            ) // ID_STRIDE
+            try:
+                with transaction.atomic(using=using):
+                    sequences.create(name=name, next_id=number + 1)
+            except IntegrityError:
+                # Счётчик только что создал другой процесс.
+                return next_id(model, using)
+    return number * ID_STRIDE + shards().index(using)
+
+
+def mirror(instance, using):
+    """Копирует строку основной базы в шард `using` или обновляет копию.
+    """
+    fields = instance._meta.concrete_fields
+    copy = instance._meta.model(
+        **{field.attname: getattr(instance, field.attname)
+           for field in fields})
+    # raw: сигналы и поля auto_now не трогают копию.
+    copy.save_base(raw=True, using=using)
+
+
+def prepare(instance, using):
+    """Готовит запись поста или комментария в шард: id из счётчика шарда
+    и копии автора и группы.
+    """
+    if not is_sharded():
+        return
+    if instance.pk is None:
+        instance.pk = next_id(type(instance), using)
+    if using == DEFAULT_DB_ALIAS:
+        return
+    for name in REFERENCES[type(instance)]:
+        related = getattr(instance, name)
+        if related is not None:
+            mirror(related, using)
+
+
+def mirror_copies(instance):
+    """Шарды, где может лежать копия пользователя или группы."""
+    if not is_sharded():
+        return []
+    manager = instance._meta.model._default_manager
+    return [
+        manager.using(alias).filter(pk=instance.pk)
+        for alias in shards() if alias != DEFAULT_DB_ALIAS
+    ]
+
+
+def refresh_mirrors(instance):
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+    }
+    for copies in mirror_copies(instance):
+        copies.update(**values)
+
+
+def drop_mirrors(instance):
+    """Удаляет копии; посты удалённого автора уходят каскадом в шарде."""
+    for copies in mirror_copies(instance):
+        copies.delete()
+
+
+class ShardRouter:
+    """Посты и комментарии — в шард автора поста.
+
+    Пользователей и группы, прочитанных через пост из шарда, роутер
+    берёт из основной базы: в шарде лежат только их копии.
+    """
+
+    def route(self, model, instance, write):
+        if not is_sharded():
+            return None
+        if issubclass(model, SHARDED):
+            return located(instance, write)
+        if instance is not None and instance._state.db not in (
+                None, DEFAULT_DB_ALIAS) and instance._state.db in shards():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints.get('instance'), write=False)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints.get('instance'), write=True)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_sharded() and {obj1._state.db, obj2._state.db} <= set(shards()):
+            return True
+        return None
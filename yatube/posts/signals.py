@@ -0,0 +1,172 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cache, search, sharding, timeline
+from .jobs import enqueue
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, using=None, update_fields=None,
+                **kwargs):
+    """Запоминает имя, которое выводится в карточках постов.
+
+    Вход пользователя сохраняет только last_login, его пропускаем.
+    """
+    previous = None
+    names = {'username', 'first_name', 'last_name'}
+    if (instance.pk and not raw and using == DEFAULT_DB_ALIAS
+            and (update_fields is None or names & set(update_fields))):
+        previous = User.objects.using(using).filter(
+            pk=instance.pk).values_list(
+                'username', 'first_name', 'last_name').first()
+    instance._previous_names = previous
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+    previous = getattr(instance, '_previous_names', None)
+    names = (instance.username, instance.first_name, instance.last_name)
+    if previous and previous != names:
+        cache.bump(*cache.author_changed_scopes(instance, previous[0]))
+        if previous[0] != instance.username:
+            cache.forget_authors(Post.objects.using(
+                sharding.author_shard(instance.pk)).filter(
+                    author_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def reference_saved(sender, instance, raw=False, using=None, **kwargs):
+    if not raw and using == DEFAULT_DB_ALIAS:
+        sharding.refresh_mirrors(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def reference_deleted(sender, instance, using=None, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        sharding.drop_mirrors(instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, using=None, **kwargs):
+    """Запоминает прежние группу и автора поста.
+
+    Варианты заменённой картинки больше не годятся и сбрасываются.
+    """
+    previous = None
+    if instance.pk and not raw:
+        previous = Post.objects.using(using).filter(
+            pk=instance.pk).values_list(
+                'group__slug', 'author_id', 'image').first()
+    group_slug, author_id, image = previous or (None, None, None)
+    instance._previous_group_slug = group_slug
+    instance._previous_author_id = author_id
+    if previous and image != instance.image.name:
+        instance.image_variants = ''
+    if not raw:
+        sharding.prepare(instance, using)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        enqueue('counters.add', instance.author_id, posts_count=1,
+                key=f'post:{instance.pk}:created')
+    elif instance._previous_author_id not in (None, instance.author_id):
+        enqueue('counters.add', instance._previous_author_id, posts_count=-1)
+        enqueue('counters.add', instance.author_id, posts_count=1)
+        cache.forget_authors([instance.pk])
+    using = instance._state.db
+    enqueue('timeline.fan_out', instance.pk, using)
+    enqueue('search.index_post', instance.pk, using)
+    scopes = cache.post_changed_scopes(instance)
+    if instance._previous_group_slug:
+        scopes.append(f'group:{instance._previous_group_slug}')
+    cache.bump(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, using=None, **kwargs):
+    enqueue('counters.add', instance.author_id, posts_count=-1,
+            key=f'post:{instance.pk}:deleted')
+    search.unindex_post(instance)
+    cache.forget_authors([instance.pk])
+    if using != DEFAULT_DB_ALIAS:
+        timeline.discard(instance)
+    cache.bump(*cache.post_changed_scopes(instance))
+
+
+@receiver(pre_save, sender=Comment)
+def comment_saving(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        sharding.prepare(instance, using)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, using=None,
+                  **kwargs):
+    if raw:
+        return
+    if created:
+        enqueue('counters.add_comments', instance.post_id, 1, using,
+                key=f'comment:{instance.pk}:created')
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, using=None, **kwargs):
+    enqueue('counters.add_comments', instance.post_id, -1, using,
+            key=f'comment:{instance.pk}:deleted')
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changing(sender, instance, raw=False, using=None, **kwargs):
+    """Запоминает страницы группы, пока у её постов прежние адрес и
+    группа: после удаления группы посты от неё уже отвязаны.
+    """
+    scopes = None
+    if not raw and using == DEFAULT_DB_ALIAS:
+        previous = instance.pk and Group.objects.using(using).filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+        scopes = cache.group_changed_scopes(instance, previous)
+    instance._changed_scopes = scopes
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    scopes = getattr(instance, '_changed_scopes', None)
+    if scopes:
+        cache.bump(*scopes)
+
+
+def follow_changed(follow, delta):
+    enqueue('counters.add', follow.user_id, following_count=delta)
+    enqueue('counters.add', follow.author_id, followers_count=delta)
+    cache.bump(
+        f'profile:{follow.user.username}',
+        f'profile:{follow.author.username}',
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue('timeline.backfill', instance.user_id, instance.author_id)
+        follow_changed(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    enqueue('timeline.prune', instance.user_id, instance.author_id)
+    follow_changed(instance, -1)
@@ -0,0 +1,66 @@
+"""Фоновые задачи сигналов и представлений, см. posts.jobs.
+
+Задача перечитывает данные при выполнении: пост могли удалить, а
+подписку — отменить, пока задача ждала в очереди. Кеш страниц,
+которые показывают результат задачи, сбрасывается после неё.
+"""
+from . import cache, counters, search, thumbnails, timeline
+from .jobs import task
+from .models import Follow, Post, User
+
+
+def profile_changed(user_id):
+    username = User.objects.filter(pk=user_id).values_list(
+        'username', flat=True).first()
+    if username is not None:
+        cache.bump(f'profile:{username}')
+
+
+@task('counters.add')
+def add_counters(user_id, **deltas):
+    counters.add(user_id, **deltas)
+    profile_changed(user_id)
+
+
+@task('counters.add_comments')
+def add_comments(post_id, delta, using=None):
+    counters.add_comments(post_id, delta, using)
+    cache.bump(f'post:{post_id}')
+
+
+@task('timeline.fan_out')
+def fan_out(post_id, using=None):
+    post = Post.objects.using(using).filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task('timeline.backfill')
+def backfill(user_id, author_id):
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+
+
+@task('timeline.prune')
+def prune(user_id, author_id):
+    if not Follow.objects.filter(
+            user_id=user_id, author_id=author_id).exists():
+        timeline.prune(user_id, author_id)
+
+
+@task('search.index_post')
+def index_post(post_id, using=None):
+    post = Post.objects.using(using).filter(pk=post_id).first()
+    if post is not None:
+        search.index_post(post)
+        cache.bump('search')
+
+
+@task('thumbnails.generate', deferred=True)
+def generate_thumbnail(image, geometry, options):
+    thumbnails.generate(image, geometry, options)
+
+
+@task('thumbnails.variants', deferred=True)
+def generate_variants(image):
+    thumbnails.generate_variants(image)
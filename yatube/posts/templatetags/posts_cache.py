@@ -0,0 +1,21 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import cache
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, show_author=True):
+    """Карточки постов из кеша: post_cards page_obj as cards."""
+    card = context.template.engine.get_template(CARD_TEMPLATE)
+
+    def render(post):
+        return card.render(
+            context.new({'post': post, 'show_author': show_author}))
+
+    return [mark_safe(html) for html in cache.post_cards(
+        posts, render, 'full' if show_author else 'no-author')]
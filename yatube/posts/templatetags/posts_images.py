@@ -0,0 +1,15 @@
+from django import template
+
+from posts.images import picture
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, css_class='card-img'):
+    """Картинка поста: `<picture>` из готовых вариантов или миниатюра."""
+    return {
+        'post': post,
+        'picture': picture(post.variants),
+        'css_class': css_class,
+    }
@@ -0,0 +1,107 @@
+"""Сторож числа SQL-запросов и планов для именованных URL posts.
+
+`record` снимает запросы страницы при пустом кеше, `grown_queries`
+сравнивает снимки при разном объёме данных, `full_scans` ищет в
+`EXPLAIN QUERY PLAN` полный просмотр больших таблиц. Обе проверки
+возвращают читаемый отчёт с виновными запросами или пустую строку.
+"""
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls as posts_urls
+
+# Таблицы, которые растут вместе с данными: их нельзя читать целиком.
+WATCHED_TABLES = {
+    'auth_user',
+    'posts_comment',
+    'posts_follow',
+    'posts_post',
+    'posts_job',
+    'posts_timelineentry',
+    'posts_usercounters',
+}
+SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+# Подзапросы Django ссылаются на таблицы через псевдонимы U0, U1...
+ALIAS = re.compile(r'(?:FROM|JOIN) "(\w+)" (?:AS )?(\w+)')
+LITERALS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'IN \(\?(?:, \?)*\)'), 'IN (...)'),
+)
+
+
+def named_urls(values, extra=None):
+    """(имя, URL) для каждого маршрута posts.urls и дополнительных URL.
+
+    `values` даёт значения параметров маршрутов по их именам.
+    """
+    for pattern in posts_urls.urlpatterns:
+        name = f'{posts_urls.app_name}:{pattern.name}'
+        kwargs = {key: values[key] for key in pattern.pattern.regex.groupindex}
+        yield name, reverse(name, kwargs=kwargs)
+    yield from (extra or {}).items()
+
+
+def record(client, url):
+    """SQL одного GET без кеша; изменения данных откатываются."""
+    for attempt in range(2):
+        # Первый запрос прогревает кеши процесса вроде ContentType.
+        cache.clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                client.get(url)
+            transaction.set_rollback(True)
+    return [query['sql'] for query in captured]
+
+
+def normalize(sql):
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def grown_queries(small, large):
+    """Отчёт об URL, где запросов стало больше вместе с данными."""
+    lines = []
+    for url, queries in large.items():
+        before = small[url]
+        if len(queries) <= len(before):
+            continue
+        lines.append(f'{url}: {len(before)} -> {len(queries)} запросов')
+        extra = Counter(map(normalize, queries)) - Counter(
+            map(normalize, before))
+        lines.extend(
+            f'  +{times} x {sql}' for sql, times in extra.most_common())
+    return '\n'.join(lines)
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(snapshots):
+    """Отчёт о SELECT, план которых читает большую таблицу целиком."""
+    lines = []
+    for url, queries in snapshots.items():
+        for sql in queries:
+            if not sql.startswith('SELECT'):
+                continue
+            plan = query_plan(sql)
+            aliases = {alias: table for table, alias in ALIAS.findall(sql)}
+            tables = {
+                aliases.get(match.group(1), match.group(1))
+                for match in map(SCAN.match, plan) if match
+            }
+            if tables & WATCHED_TABLES:
+                lines.append(
+                    f'{url}: полный просмотр {", ".join(sorted(tables))}')
+                lines.append(f'  {sql}')
+                lines.extend(f'    {step}' for step in plan)
+    return '\n'.join(lines)
@@ -0,0 +1,125 @@
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import api
+from posts.models import Comment, Group, Post, User
+from posts.utils import explicit_dates
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='api-author')
+        cls.other = User.objects.create_user(username='api-other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание')
+        now = timezone.now()
+        with explicit_dates():
+            cls.posts = [
+                Post.objects.create(
+                    text=f'Пост {number}',
+                    author=cls.author if number % 2 else cls.other,
+                    group=cls.group if number % 3 else None,
+                    pub_date=now - timedelta(minutes=number))
+                for number in range(25)
+            ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.other, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 10)
+            ids += [row['id'] for row in data['results']]
+            url = data['next']
+        return ids
+
+    def test_feed_is_paged_by_cursor(self):
+        ids = self.pages(reverse('posts:api_posts') + '?limit=10')
+        self.assertEqual(ids, [post.pk for post in self.posts])
+
+    def test_post_fields(self):
+        response = self.client.get(reverse('posts:api_posts'))
+        first = response.json()['results'][0]
+        post = self.posts[0]
+        self.assertEqual(first, {
+            'id': post.pk,
+            'pub_date': first['pub_date'],
+            'text': post.text,
+            'author': 'api-other',
+            'group': None,
+            'image': None,
+            'comments_count': 1,
+        })
+        self.assertEqual(len(response.json()['results']), api.DEFAULT_LIMIT)
+
+    def test_image_url(self):
+        """Страница и выгрузка отдают одинаковую ссылку на картинку."""
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(image='posts/x.jpg')
+        url = Post.image.field.storage.url('posts/x.jpg')
+        for path in (reverse('posts:api_posts'),
+                     reverse('posts:api_author_posts', args=['api-other'])):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'][0]['image'], url)
+        response = self.client.get(
+            reverse('posts:api_posts'), {'format': 'ndjson'})
+        first = b''.join(response.streaming_content).decode().splitlines()[0]
+        self.assertEqual(json.loads(first)['image'], url)
+
+    def test_group_and_author_posts(self):
+        in_group = self.pages(
+            reverse('posts:api_group_posts', args=['api-group']) + '?limit=7')
+        self.assertEqual(in_group, [
+            post.pk for post in self.posts if post.group_id])
+        by_author = self.pages(
+            reverse('posts:api_author_posts', args=['api-author'])
+            + '?limit=5')
+        self.assertEqual(by_author, [
+            post.pk for post in self.posts if post.author == self.author])
+        groups = self.client.get(reverse('posts:api_groups')).json()
+        self.assertEqual(groups['results'][0]['slug'], 'api-group')
+
+    def test_post_comments(self):
+        url = reverse('posts:api_post_comments', args=[self.posts[0].pk])
+        rows = self.client.get(url).json()['results']
+        self.assertEqual(rows[0]['text'], 'Комментарий')
+        self.assertEqual(rows[0]['author'], 'api-other')
+
+    def test_unknown_objects(self):
+        for url in (reverse('posts:api_group_posts', args=['missing']),
+                    reverse('posts:api_author_posts', args=['missing']),
+                    reverse('posts:api_post_comments', args=[10 ** 6])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+
+    def test_ndjson_streams_whole_list(self):
+        response = self.client.get(
+            reverse('posts:api_posts'), {'format': 'ndjson'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], api.NDJSON)
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content).decode()
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts])
+        self.assertEqual(rows[1]['group'], 'api-group')
+
+    def test_api_is_read_only(self):
+        response = self.client.post(reverse('posts:api_posts'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,141 @@
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from posts import counters, search, timeline
+from posts.benchmarks import dataset, results, runner, templates
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserCounters)
+
+SIZES = {'users': 6, 'groups': 2, 'posts': 20, 'comments': 15, 'follows': 8}
+
+
+class DatasetTests(TestCase):
+    def test_seed_is_reproducible(self):
+        first = dataset.seed(SIZES, seed=3)
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), SIZES['comments'])
+        self.assertEqual(Follow.objects.count(), SIZES['follows'])
+        self.assertTrue(TimelineEntry.objects.exists())
+        texts = list(Post.objects.order_by('pk').values_list(
+            'text', flat=True))
+
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        for model in (User, Group):
+            model.objects.all().delete()
+        second = dataset.seed(SIZES, seed=3)
+        self.assertEqual(first.words, second.words)
+        self.assertEqual(first.reader, second.reader)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            texts)
+
+    def test_targets_cover_posts_views(self):
+        data = dataset.seed(SIZES, seed=1)
+        self.assertEqual(dataset.load().reader, data.reader)
+        paths = runner.targets(data, random.Random(1), samples=2)
+        self.assertEqual(set(paths), {
+            'posts:index', 'posts:group_list', 'posts:profile',
+            'posts:post_detail', 'posts:post_comments', 'posts:search',
+            'posts:follow_index',
+        })
+        for view, urls in paths.items():
+            for url in urls:
+                response = self.client.get(url)
+                self.assertIn(response.status_code, (200, 302), url)
+
+    def test_templates_are_measured_per_mode(self):
+        data = dataset.seed(SIZES, seed=1)
+        paths = runner.targets(data, random.Random(1), samples=1)
+        rows = templates.run(paths, data.reader, renders=2)
+        for mode in templates.MODES:
+            for name in ('posts/index.html', 'posts/post_detail.html',
+                         'posts/follow.html'):
+                row = rows[f'{mode}:{name}']
+                self.assertEqual(row['renders'], 2)
+                self.assertGreater(row['first_ms'], 0)
+
+
+class SeedCommandTests(TestCase):
+    OPTIONS = {
+        'users': 30, 'groups': 3, 'posts': 300, 'comments': 200,
+        'follows': 60, 'batch_size': 50, 'stdout': StringIO(),
+    }
+
+    def test_derived_data_matches_rows(self):
+        call_command('seed_yatube', seed=5, **self.OPTIONS)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertEqual(Follow.objects.count(), 60)
+        self.assertEqual(UserCounters.objects.count(), 30)
+        self.assertEqual(counters.reconcile(), 0)
+        entries = TimelineEntry.objects.count()
+        self.assertTrue(entries)
+        self.assertEqual(timeline.rebuild(), entries)
+        if search.is_supported():
+            word = Post.objects.first().text.split()[1]
+            found, order = search.search(word)
+            self.assertTrue(found.exists())
+
+    def test_distribution_is_skewed_and_reproducible(self):
+        call_command('seed_yatube', seed=5, **self.OPTIONS)
+        posts = list(UserCounters.objects.values_list(
+            'posts_count', flat=True))
+        self.assertGreater(max(posts), 3 * sum(posts) / len(posts))
+        self.assertLess(
+            Post.objects.earliest('pub_date').pub_date,
+            Post.objects.latest('pub_date').pub_date)
+        texts = list(Post.objects.values_list('text', flat=True))
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command('seed_yatube', seed=5, **self.OPTIONS)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), texts)
+
+
+class StatisticsTests(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(runner.percentile(values, 0.5), 50)
+        self.assertEqual(runner.percentile(values, 0.95), 95)
+        self.assertEqual(runner.percentile(values, 0.99), 99)
+        self.assertEqual(runner.percentile([], 0.5), 0.0)
+
+    def test_run_reports_every_view(self):
+        def fetch(path, authenticated=False):
+            return 404 if path == '/missing/' else 200
+
+        views = runner.run(
+            {'posts:index': ['/'], 'posts:search': ['/missing/']},
+            fetch, requests=20, concurrency=3, warmup=0)
+        self.assertEqual(views['posts:index']['requests'], 20)
+        self.assertEqual(views['posts:index']['errors'], 0)
+        self.assertEqual(views['posts:search']['errors'], 20)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'posts:index': {'p95_ms': 10, 'rps': 100, 'queries': 2}}
+        current = {'posts:index': {'p95_ms': 11, 'rps': 50, 'queries': 3}}
+        flagged = {
+            metric: regression
+            for view, metric, old, new, change, regression
+            in results.compare(current, baseline, tolerance=0.2)
+        }
+        self.assertEqual(
+            flagged, {'p95_ms': False, 'rps': True, 'queries': True})
+
+
+class BenchIndexesTests(TestCase):
+    def test_follow_is_measured_without_unique_constraint(self):
+        dataset.seed(SIZES, seed=3)
+        out = StringIO()
+        call_command('bench_indexes', repeat=1, stdout=out)
+        with_indexes, without = out.getvalue().split('Без индексов')
+        self.assertIn('sqlite_autoindex_posts_follow', with_indexes)
+        self.assertNotIn('sqlite_autoindex_posts_follow', without)
+        follow = Follow.objects.first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=follow.user, author=follow.author)
@@ -0,0 +1,330 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts import cache as page_cache
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class VersionedPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='test-slug', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание')
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def is_cached(self, client, url):
+        """Ответ из кеша не рендерит шаблонов, и контекста у него нет."""
+        return client.get(url).context is None
+
+    def test_anonymous_and_authorized_cached_separately(self):
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        self.assertTrue(self.is_cached(self.guest_client, url))
+        self.assertFalse(self.is_cached(self.authorized_client, url))
+        self.assertTrue(self.is_cached(self.authorized_client, url))
+
+    def test_post_save_resets_only_affected_pages(self):
+        """Новый пост сбрасывает главную и свою группу, но не чужую."""
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        other = reverse('posts:group_list', kwargs={'slug': 'other'})
+        for url in (index, group, other):
+            self.guest_client.get(url)
+        Post.objects.create(text='Новый', author=self.user, group=self.group)
+        self.assertFalse(self.is_cached(self.guest_client, index))
+        self.assertFalse(self.is_cached(self.guest_client, group))
+        self.assertTrue(self.is_cached(self.guest_client, other))
+
+    def test_group_change_resets_previous_group(self):
+        group = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        self.guest_client.get(group)
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertFalse(self.is_cached(self.guest_client, group))
+
+    def test_group_rename_resets_pages_of_its_posts(self):
+        """Новый адрес и название группы видны на страницах её постов."""
+        group = Group.objects.create(
+            title='Старое название', slug='old-slug', description='')
+        post = Post.objects.create(text='В группе', author=self.user,
+                                   group=group)
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'old-slug'}),
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        group.title = 'Новое название'
+        group.slug = 'new-slug'
+        group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertFalse(self.is_cached(self.guest_client, url))
+        self.assertContains(self.guest_client.get(urls[2]), 'new-slug')
+        self.guest_client.get(urls[1])
+        group.delete()
+        self.assertFalse(self.is_cached(self.guest_client, urls[1]))
+
+    def test_comment_resets_post_detail(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        self.assertTrue(self.is_cached(self.guest_client, url))
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        self.assertFalse(self.is_cached(self.guest_client, url))
+
+    def test_follow_resets_profile(self):
+        url = reverse('posts:profile', kwargs={'username': 'TestAuthor'})
+        self.authorized_client.get(url)
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.authorized_client.get(url)
+        self.assertTrue(response.context['following'])
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='CardAuthor')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cards', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.user, group=cls.group)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.rendered = []
+
+    def render(self, post):
+        self.rendered.append(post.pk)
+        return f'<p>{post.text}</p>'
+
+    def cards(self):
+        return page_cache.post_cards(
+            Post.objects.for_feed().order_by('pk'), self.render, 'test')
+
+    def test_page_is_assembled_from_cached_cards(self):
+        first = self.cards()
+        self.assertEqual(len(self.rendered), 3)
+        with mock.patch.object(
+                cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assertEqual(self.cards(), first)
+        self.assertEqual(len(self.rendered), 3)
+        # Одно чтение версий и одно — карточек.
+        self.assertEqual(get_many.call_count, 2)
+
+    def test_edit_resets_only_its_card(self):
+        self.cards()
+        post = self.posts[1]
+        post.text = 'Исправленный'
+        post.save()
+        self.rendered.clear()
+        self.assertIn('<p>Исправленный</p>', self.cards())
+        self.assertEqual(self.rendered, [post.pk])
+
+    def test_author_rename_resets_cards_and_pages(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.cards()
+        self.user.first_name = 'Новое'
+        self.user.save()
+        self.rendered.clear()
+        self.cards()
+        self.assertEqual(len(self.rendered), 3)
+        self.assertContains(self.client.get(url), 'Новое')
+
+    def test_login_does_not_reset_pages(self):
+        self.client.get(reverse('posts:index'))
+        with mock.patch.object(page_cache, 'bump') as bump:
+            self.client.force_login(self.user)
+            self.user.save(update_fields=['last_login'])
+        bump.assert_not_called()
+
+
+class StampedeTests(SimpleTestCase):
+    """Пересчёт страницы без базы: представление лишь считает вызовы."""
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+        @page_cache.cached_page(lambda: ['stampede'])
+        def slow_view(request):
+            with self.calls_lock:
+                self.calls += 1
+                number = self.calls
+            time.sleep(0.2)
+            return HttpResponse(f'render {number}')
+
+        self.view = slow_view
+
+    @staticmethod
+    def request():
+        request = RequestFactory().get('/stampede/')
+        request.user = AnonymousUser()
+        return request
+
+    def get(self):
+        return self.view(self.request()).content.decode()
+
+    def burst(self, size=8):
+        barrier = threading.Barrier(size)
+        contents = []
+
+        def fetch():
+            barrier.wait()
+            contents.append(self.get())
+
+        threads = [threading.Thread(target=fetch) for _ in range(size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return contents
+
+    def test_cold_key_is_rendered_once(self):
+        contents = self.burst()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(set(contents), {'render 1'})
+
+    def test_others_get_stale_copy_while_one_rebuilds(self):
+        self.get()
+        page_cache.bump('stampede')
+        stale = page_cache.STALE_PAGES.value(view='slow_view')
+        contended = page_cache.PAGE_LOCKS.value(
+            view='slow_view', result='contended')
+        contents = self.burst()
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(contents.count('render 2'), 1)
+        self.assertEqual(contents.count('render 1'), 7)
+        self.assertEqual(
+            page_cache.STALE_PAGES.value(view='slow_view') - stale, 7)
+        self.assertEqual(page_cache.PAGE_LOCKS.value(
+            view='slow_view', result='contended') - contended, 7)
+        self.assertEqual(self.get(), 'render 2')
+
+    def test_waits_for_lock_holder_without_copy(self):
+        cache.add(f'{page_cache.page_key(self.request())}:lock', 1)
+        with mock.patch.object(page_cache, 'LOCK_WAIT', 0.1):
+            self.assertEqual(self.get(), 'render 1')
+
+    def test_early_expiry_grows_towards_deadline(self):
+        entry = {'versions': '1', 'expires': 100.0, 'delta': 1.0}
+        with mock.patch.object(page_cache.random, 'random', return_value=0.9):
+            # -ln(0.1) ≈ 2.3 секунды досрочно при сборке за секунду.
+            self.assertTrue(page_cache.is_fresh(entry, '1', now=97.0))
+            self.assertFalse(page_cache.is_fresh(entry, '1', now=98.0))
+        self.assertFalse(page_cache.is_fresh(entry, '2', now=0.0))
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='Группа', slug='test-slug', description='Описание')
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_matching_etag_skips_rendering(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                # Без копии в кеше 200 пришлось бы отрисовать заново.
+                request = RequestFactory().get(url)
+                request.user = AnonymousUser()
+                cache.delete(page_cache.page_key(request))
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_cached_pages_skip_database(self):
+        """Копия из кеша и ответ 304 не обращаются к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+
+    def test_renamed_author_still_resets_post_page(self):
+        """После переименования страница поста следит за новым профилем."""
+        url = self.urls[3]
+        self.client.get(url)
+        self.user.username = 'Renamed'
+        self.user.save()
+        etag = self.client.get(url)['ETag']
+        page_cache.bump('profile:Renamed')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.user.username = 'TestAuthor'
+        self.user.save()
+
+    def test_if_modified_since(self):
+        url = self.urls[0]
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        index, group, profile, detail = (
+            self.client.get(url)['ETag'] for url in self.urls)
+        Comment.objects.create(post=self.post, author=self.user, text='!')
+        self.assertNotEqual(self.client.get(self.urls[3])['ETag'], detail)
+        self.assertEqual(self.client.get(self.urls[1])['ETag'], group)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url, etag in zip(self.urls[:3], (index, group, profile)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_authorized_pages_are_private(self):
+        url = self.urls[0]
+        anonymous = self.client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('private', anonymous['Cache-Control'])
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('private', response['Cache-Control'])
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+from posts.utils import COMMENTS_PER_PAGE
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestAuthor')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_detail_renders_first_page_only(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_comments_fragment_loads_next_page(self):
+        """Фрагмент отдаёт оставшиеся комментарии одним запросом к ним."""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk})
+        cursor = first.context['comments'].next_cursor
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'cursor': cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        rest = list(response.context['comments'])
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(set(rest) & set(first.context['comments']))
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_comments_fragment_for_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
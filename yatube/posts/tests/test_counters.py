@@ -0,0 +1,80 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User, UserCounters
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_create_and_delete(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Пост'})
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+        Post.objects.get(text='Пост').delete()
+        self.assertEqual(self.counters(self.user).posts_count, 0)
+
+    def test_comments_count(self):
+        post = Post.objects.create(text='Пост', author=self.user)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'})
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counts(self):
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'Reader'}))
+        self.assertEqual(self.counters(self.user).following_count, 1)
+        self.assertEqual(self.counters(self.reader).followers_count, 1)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Reader'}))
+        self.assertEqual(self.counters(self.reader).followers_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """bulk_create обходит сигналы, команда выравнивает счётчики."""
+        Post.objects.bulk_create(
+            Post(text='Пост', author=self.user) for _ in range(3))
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.user)])
+        call_command('reconcile_counters', stdout=StringIO())
+        counters = self.counters(self.user)
+        self.assertEqual(counters.posts_count, 3)
+        self.assertEqual(counters.followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+
+    def test_pages_do_not_count(self):
+        """Страницы поста и профиля не выполняют COUNT(*)."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        urls = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('posts:profile', kwargs={'username': 'TestAuthor'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertContains(response, 'Всего постов')
+                self.assertFalse(any(
+                    'COUNT(' in query['sql'] for query in queries))
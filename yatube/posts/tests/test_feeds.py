@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='feeder', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание')
+        cls.post = Post.objects.create(
+            text='Все счастливые семьи похожи друг на друга',
+            author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        for feed_type in ('rss', 'atom'):
+            yield reverse('posts:index_feed', args=[feed_type])
+            yield reverse('posts:group_feed', args=['classic', feed_type])
+            yield reverse('posts:profile_feed', args=['feeder', feed_type])
+
+    def test_feeds_list_posts(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('xml', response['Content-Type'])
+                self.assertContains(response, 'Все счастливые семьи')
+                self.assertContains(response, 'Лев Толстой')
+                self.assertTrue(response.has_header('ETag'))
+
+    def test_unchanged_feed_costs_no_queries(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_feeds(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Post.objects.create(
+            text='Новый роман', author=self.author, group=self.group)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новый роман')
+
+    def test_unknown_group_or_author(self):
+        for url in (reverse('posts:group_feed', args=['missing', 'rss']),
+                    reverse('posts:profile_feed', args=['missing', 'atom'])):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_pages_link_their_feeds(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:index_feed', args=['atom']))
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import images
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(size=(1600, 900)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 90, 40)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(
+        'photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generate_stores_variants(self):
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=jpeg())
+        images.generate(post.image.name)
+        post.refresh_from_db()
+        formats = images.modern_formats() + ['JPEG']
+        self.assertEqual(
+            sorted((v['width'], v['format']) for v in post.variants),
+            sorted((width, image_format) for width in images.WIDTHS
+                   for image_format in formats),
+        )
+        for variant in post.variants:
+            self.assertEqual(
+                variant['height'], round(variant['width'] * images.ASPECT))
+            self.assertGreater(variant['bytes'], 0)
+
+    def test_small_image_is_not_upscaled(self):
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=jpeg((700, 400)))
+        variants = images.generate(post.image.name)
+        self.assertEqual({variant['width'] for variant in variants}, {480})
+
+    def test_page_renders_picture_without_storage(self):
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=jpeg())
+        images.generate(post.image.name)
+        cache.clear()
+        broken = mock.Mock(side_effect=AssertionError('storage access'))
+        with mock.patch.multiple(
+                FileSystemStorage, open=broken, exists=broken, size=broken):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, ' 1440w')
+
+    def test_replacing_image_resets_variants(self):
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=jpeg())
+        images.generate(post.image.name)
+        post.refresh_from_db()
+        post.image = jpeg()
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.variants, [])
+
+    def test_picture_prefers_modern_formats(self):
+        variants = [
+            {'format': image_format, 'width': width, 'height': 1,
+             'url': f'/{width}.{image_format}'}
+            for image_format in ('JPEG', 'WEBP', 'AVIF')
+            for width in (960, 480)
+        ]
+        picture = images.picture(variants)
+        self.assertEqual(
+            [source['type'] for source in picture['sources']],
+            ['image/avif', 'image/webp'],
+        )
+        self.assertEqual(
+            picture['srcset'], '/480.JPEG 480w, /960.JPEG 960w')
+        self.assertEqual(picture['img']['width'], 960)
@@ -0,0 +1,147 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import jobs
+from posts.models import Follow, Job, Post, TimelineEntry, User, UserCounters
+
+CALLS = []
+
+
+@jobs.task('test.record')
+def record(value, fail=False):
+    CALLS.append(value)
+    if fail:
+        raise ValueError('сбой')
+
+
+@jobs.task('test.deferred', deferred=True)
+def deferred(value):
+    CALLS.append(value)
+
+
+@override_settings(JOBS_EAGER=False, JOBS_WORKERS=0)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+        jobs.JOBS.clear()
+
+    def test_enqueue_with_key_runs_once(self):
+        """Повторная постановка с тем же ключом ничего не добавляет."""
+        jobs.enqueue('test.record', 1, key='once')
+        jobs.enqueue('test.record', 1, key='once')
+        self.assertEqual(Job.objects.filter(key='once').count(), 1)
+        self.assertEqual(jobs.run_pending(), 1)
+        jobs.enqueue('test.record', 1, key='once')
+        self.assertEqual(jobs.run_pending(), 0)
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(jobs.JOBS.value(name='test.record', result='done'), 1)
+
+    def test_push_again_requeues_done_job(self):
+        """С again выполненная задача с тем же ключом ставится снова."""
+        jobs.push('test.record', (1,), key='again')
+        jobs.run_pending()
+        jobs.push('test.record', (2,), key='again', again=True)
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(CALLS, [1, 2])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_deferred_task_is_queued_when_eager(self):
+        jobs.enqueue('test.record', 1)
+        jobs.enqueue('test.deferred', 2)
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(
+            list(Job.objects.values_list('name', flat=True)),
+            ['test.deferred'])
+
+    def test_failed_job_retries_with_backoff(self):
+        """Упавшая задача откладывается, после MAX_ATTEMPTS — с ошибкой."""
+        jobs.enqueue('test.record', 2, fail=True, key='failing')
+        with self.assertLogs('posts.jobs', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job = Job.objects.get(key='failing')
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(jobs.run_pending(), 0)
+        for _ in range(jobs.MAX_ATTEMPTS - 1):
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            with self.assertLogs('posts.jobs', 'WARNING'):
+                jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, 'сбой')
+        self.assertEqual(len(CALLS), jobs.MAX_ATTEMPTS)
+        self.assertEqual(
+            jobs.JOBS.value(name='test.record', result='failed'), 1)
+
+    def test_stale_and_old_jobs(self):
+        """Брошенные задачи возвращаются в очередь, старые удаляются."""
+        long_ago = timezone.now() - timedelta(days=2)
+        Job.objects.create(
+            name='test.record', key='stale', status=Job.RUNNING)
+        Job.objects.create(name='test.record', key='old', status=Job.DONE)
+        Job.objects.update(updated=long_ago)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.purge(), 1)
+        self.assertEqual(
+            list(Job.objects.values_list('key', 'status')),
+            [('stale', Job.PENDING)])
+
+    @override_settings(JOBS_WORKERS=2)
+    def test_only_web_server_starts_pool(self):
+        """Вне веб-сервера пул потоков не заводится."""
+        with mock.patch.object(jobs, 'ThreadPoolExecutor') as pool:
+            jobs.start_workers()
+            pool.assert_not_called()
+            with mock.patch.object(jobs, '_serving', True), \
+                    mock.patch.object(jobs, '_executor', None):
+                jobs.start_workers()
+        pool.return_value.submit.assert_called_once_with(jobs.work)
+
+    def test_run_workers_command(self):
+        jobs.enqueue('test.record', 3)
+        out = StringIO()
+        call_command('run_workers', '--once', '--workers', '1', stdout=out)
+        self.assertEqual(CALLS, [3])
+        self.assertIn('Выполнено задач: 1', out.getvalue())
+        self.assertIn('yatube_jobs_total', out.getvalue())
+        self.assertEqual(jobs.stats()[Job.DONE], 1)
+
+
+@override_settings(JOBS_EAGER=False, JOBS_WORKERS=0)
+class QueuedSideEffectsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Follower')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_post_side_effects_wait_for_workers(self):
+        """Лента подписчика и счётчики меняются после выполнения задач."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        jobs.run_pending()
+        self.client.post(reverse('posts:post_create'), data={'text': 'Пост'})
+        post = Post.objects.get(text='Пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 0)
+        jobs.run_pending()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 1)
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'Пост'})
+        self.assertEqual(len(response.context['page_obj']), 1)
@@ -1,6 +1,7 @@
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -29,3 +30,39 @@ class PostModelTest(TestCase):
         group = self.group
         expected_title = group.title
         self.assertEqual(expected_title, str(group))
+
+
+class IndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.get_compiler(connection.alias).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена в базе."""
+        Follow.objects.create(user=self.user, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
+
+    def test_feeds_use_composite_indexes(self):
+        """Ленты читаются диапазоном индекса без сортировки."""
+        querysets = {
+            'post_author_pub_date_idx': Post.objects.filter(
+                author=self.author).order_by('-pub_date', '-pk')[:11],
+            'post_group_pub_date_idx': Post.objects.filter(
+                group=1).order_by('-pub_date', '-pk')[:11],
+            'comment_post_created_idx': Comment.objects.filter(
+                post=1).order_by('-created', '-pk')[:21],
+        }
+        for index, queryset in querysets.items():
+            with self.subTest(index=index):
+                plan = self.query_plan(queryset)
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics, profiling
+from posts.models import Post, User
+
+INDEX = (('view', 'posts:index'),)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Profiler')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        for metric in metrics.REGISTRY:
+            metric.clear()
+
+    def test_request_is_measured_per_view(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(profiling.REQUEST_SECONDS.count(**dict(INDEX)), 1)
+        counts, queries = profiling.DB_QUERIES.series[INDEX]
+        self.assertGreater(queries, 0)
+        counts, seconds = profiling.RENDER_SECONDS.series[INDEX]
+        self.assertGreater(seconds, 0)
+
+    def test_cache_hits_and_misses(self):
+        self.client.get(reverse('posts:index'))
+        self.assertGreater(
+            profiling.CACHE_REQUESTS.value(
+                view='posts:index', result='miss'), 0)
+        self.client.get(reverse('posts:index'))
+        self.assertGreater(
+            profiling.CACHE_REQUESTS.value(view='posts:index', result='hit'),
+            0)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_count{view="posts:index"} 1')
+        self.assertContains(
+            response, '# TYPE yatube_db_queries histogram')
+
+    def test_metrics_hidden_from_outside(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(PROFILING_SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_queries(self):
+        with self.assertLogs('yatube.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('(posts:index)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+        self.assertEqual(
+            profiling.SLOW_REQUESTS.value(view='posts:index'), 1)
+
+
+class HistogramTests(TestCase):
+    def test_prometheus_text(self):
+        histogram = metrics.Histogram('test_seconds', 'Тест', (0.1, 1))
+        metrics.REGISTRY.remove(histogram)
+        histogram.observe(0.05, view='a')
+        histogram.observe(0.5, view='a')
+        histogram.observe(5, view='a')
+        self.assertEqual(list(histogram.render()), [
+            '# HELP test_seconds Тест',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="a",le="0.1"} 1',
+            'test_seconds_bucket{view="a",le="1.0"} 2',
+            'test_seconds_bucket{view="a",le="+Inf"} 3',
+            'test_seconds_sum{view="a"} 5.55',
+            'test_seconds_count{view="a"} 3',
+        ])
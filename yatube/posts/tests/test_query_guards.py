@@ -0,0 +1,92 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests import guards
+
+
+class QueryGuardsTests(TestCase):
+    """Страницы posts не делают N+1 и не читают большие таблицы целиком."""
+    # Оба объёма больше страницы, чтобы совпадала ветка пагинации.
+    SIZES = (15, 40)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Пост про котиков', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def grow(self, size):
+        """Доводит посты, комментарии и подписчиков до `size`."""
+        for number in range(Post.objects.count(), size):
+            User.objects.create_user(username=f'follower{number}')
+            follower = User.objects.get(username=f'follower{number}')
+            Follow.objects.create(user=follower, author=self.author)
+            Follow.objects.create(user=self.reader, author=follower)
+            Post.objects.create(
+                text=f'Пост про котиков {number}',
+                author=self.author, group=self.group)
+            Post.objects.create(text=f'Пост {number}', author=follower)
+            Comment.objects.create(
+                post=self.post, author=follower, text=f'Ответ {number}')
+
+    def snapshot(self):
+        values = {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': self.post.pk,
+            'feed_type': 'rss',
+        }
+        extra = {
+            'posts:index?page=2': reverse('posts:index') + '?page=2',
+            'posts:search?q': reverse('posts:search') + '?q=котиков',
+        }
+        return {
+            name: guards.record(self.client, url)
+            for name, url in guards.named_urls(values, extra)
+        }
+
+    def test_query_counts_do_not_grow_with_data(self):
+        snapshots = []
+        for size in self.SIZES:
+            self.grow(size)
+            snapshots.append(self.snapshot())
+        report = guards.grown_queries(*snapshots)
+        self.assertFalse(report, f'Запросов стало больше:\n{report}')
+
+    def test_plans_avoid_full_scans(self):
+        self.grow(self.SIZES[-1])
+        report = guards.full_scans(self.snapshot())
+        self.assertFalse(report, f'Полный просмотр таблиц:\n{report}')
+
+
+class GuardsReportTests(TestCase):
+    def test_grown_queries_names_extra_statements(self):
+        small = {'posts:index': ['SELECT 1 FROM t WHERE id = 1']}
+        large = {'posts:index': [
+            'SELECT 1 FROM t WHERE id = 1',
+            "SELECT 1 FROM t WHERE id = 2 AND name = 'x'",
+        ]}
+        report = guards.grown_queries(small, large)
+        self.assertIn('posts:index: 1 -> 2', report)
+        self.assertIn('+1 x SELECT ? FROM t WHERE id = ?', report)
+
+    def test_full_scan_is_reported(self):
+        report = guards.full_scans({'posts:index': [
+            'SELECT "id" FROM "posts_post" WHERE "text" = \'x\'',
+            'SELECT "id" FROM "posts_post" WHERE "id" = 1',
+            'SELECT "id" FROM "posts_post" WHERE "id" IN (SELECT U0."id" '
+            'FROM "posts_comment" U0 WHERE U0."text" = \'y\')',
+        ]})
+        self.assertIn('полный просмотр posts_post', report)
+        self.assertIn('полный просмотр posts_comment', report)
+        self.assertNotIn('WHERE "id" = 1', report)
@@ -0,0 +1,150 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core import replicas
+from posts.models import Post
+
+ROUTER = replicas.ReplicaRouter()
+
+
+def add_database(test, alias, path):
+    """Временный псевдоним базы только для чтения."""
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path}?mode=ro',
+    }
+    connections.ensure_defaults(alias)
+    connections.prepare_test_settings(alias)
+
+    def remove():
+        connections[alias].close()
+        del connections.databases[alias]
+        if hasattr(connections._connections, alias):
+            delattr(connections._connections, alias)
+    test.addCleanup(remove)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(replicas, 'is_available', lambda a: True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def route(self, request, module='posts.views', write=False):
+        """База, которую роутер выбрал для чтения внутри представления."""
+        chosen = []
+
+        def view(request):
+            if write:
+                ROUTER.db_for_write(Post)
+            chosen.append(ROUTER.db_for_read(Post))
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        view.__module__ = module
+        middleware = replicas.ReplicaMiddleware(get_response)
+        response = middleware(request)
+        return chosen[0] or DEFAULT_DB_ALIAS, response
+
+    def test_page_reads_go_to_replica(self):
+        alias, response = self.route(self.factory.get('/'))
+        self.assertEqual(alias, 'replica')
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_other_code_reads_primary(self):
+        alias, response = self.route(self.factory.get('/'), module='users')
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+        self.assertIsNone(ROUTER.db_for_read(Post))
+
+    def test_sessions_and_users_read_primary(self):
+        def view(request):
+            return HttpResponse(str([
+                ROUTER.db_for_read(model) for model in (Session, User)]))
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        view.__module__ = 'posts.views'
+        middleware = replicas.ReplicaMiddleware(get_response)
+        response = middleware(self.factory.get('/'))
+        self.assertEqual(response.content, b'[None, None]')
+
+    def test_write_pins_user_to_primary(self):
+        alias, response = self.route(self.factory.post('/'), write=True)
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], replicas.PIN_SECONDS)
+        request = self.factory.get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        alias, response = self.route(request)
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_reads_after_write_in_same_request_use_primary(self):
+        alias, response = self.route(self.factory.get('/'), write=True)
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+
+class ReplicaFallbackTests(SimpleTestCase):
+    def test_unavailable_replica_falls_back_to_primary(self):
+        add_database(self, 'broken', '/nonexistent/replica.sqlite3')
+        self.addCleanup(replicas._unavailable_until.clear)
+        with override_settings(DATABASE_REPLICAS=['broken']):
+            with self.assertLogs('core.replicas', 'WARNING'):
+                self.assertIsNone(replicas.choose_replica())
+            with mock.patch.object(
+                    connections['broken'], 'ensure_connection') as connect:
+                self.assertIsNone(replicas.choose_replica())
+            connect.assert_not_called()
+
+
+def synced_replica(test):
+    """Временная реплика, скопированная с основной базы."""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    path = os.path.join(directory, 'replica.sqlite3')
+    add_database(test, 'copy', path)
+    with override_settings(DATABASE_REPLICAS=['copy']):
+        call_command('sync_replicas', stdout=StringIO())
+    return path
+
+
+class SyncReplicasTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_copies_primary(self):
+        path = synced_replica(self)
+        with override_settings(DATABASE_REPLICAS=['copy']):
+            self.assertTrue(replicas.is_available('copy'))
+        tables = sqlite3.connect(path).execute(
+            "SELECT name FROM sqlite_master WHERE name = 'posts_post'")
+        self.assertEqual(len(tables.fetchall()), 1)
+
+
+class LoginAfterSyncTests(TestCase):
+    def test_new_session_is_read_from_primary(self):
+        """Сессии, созданной после копирования реплики, там нет."""
+        synced_replica(self)
+        self.client.force_login(User.objects.create_user(username='reader'))
+        with override_settings(DATABASE_REPLICAS=['copy']):
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post, User
+from posts.utils import TOP_TEN, CursorPaginator
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestAuthor')
+        cls.post = Post.objects.create(
+            text='Котики захватили интернет', author=cls.user)
+        Post.objects.create(text='Собаки против', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response, list(response.context['page_obj'])
+
+    def test_search_finds_post(self):
+        """Поиск не зависит от регистра и ищет по началу слова."""
+        for query in ('котики', 'КОТИКИ', 'интер'):
+            with self.subTest(query=query):
+                _, posts = self.found(query)
+                self.assertEqual(posts, [self.post])
+
+    def test_admin_changelist_search(self):
+        """Поиск в админке считает найденное без ошибок bm25."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post])
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.create(text='Про хомяков', author=self.user)
+        post.text = 'Теперь про попугаев'
+        post.save()
+        self.assertEqual(self.found('хомяков')[1], [])
+        self.assertEqual(self.found('попугаев')[1], [post])
+        post.delete()
+        self.assertEqual(self.found('попугаев')[1], [])
+
+    def test_quotes_do_not_break_query(self):
+        response, posts = self.found('"котики OR')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(posts, [])
+
+    def test_empty_query_has_no_results(self):
+        for query in ('', '   ', '!!!'):
+            with self.subTest(query=query):
+                response, posts = self.found(query, page=2)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(posts, [])
+        self.assertEqual(CursorPaginator(Post.objects.none(), 10).count, 0)
+
+    def test_results_ranked_and_paginated(self):
+        """Более релевантные посты выше, ссылки сохраняют запрос."""
+        best = Post.objects.create(text='попугай попугай', author=self.user)
+        Post.objects.bulk_create(
+            Post(text=f'попугай и кот {i}', author=self.user)
+            for i in range(TOP_TEN))
+        search.rebuild()
+        response, posts = self.found('попугай')
+        self.assertEqual(posts[0], best)
+        self.assertContains(response, 'q=%D0%BF')
+        cursor = response.context['page_obj'].next_cursor
+        _, rest = self.found('попугай', cursor=cursor)
+        self.assertEqual(len(rest), 1)
+        self.assertFalse(set(rest) & set(posts))
@@ -0,0 +1,236 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import counters, resharding, search, sharding
+from posts.models import (Comment, Follow, Group, Post, ShardAssignment,
+                          User, UserCounters)
+from posts.utils import explicit_dates
+
+SHARD = 'shard'
+SHARDS = [DEFAULT_DB_ALIAS, SHARD]
+
+
+def add_shard(path):
+    connections.databases[SHARD] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+    }
+    connections.ensure_defaults(SHARD)
+    connections.prepare_test_settings(SHARD)
+
+
+def remove_shard():
+    connections[SHARD].close()
+    del connections.databases[SHARD]
+    if hasattr(connections._connections, SHARD):
+        delattr(connections._connections, SHARD)
+
+
+class SingleDatabaseTests(SimpleTestCase):
+    def test_routing_is_unchanged(self):
+        router = sharding.ShardRouter()
+        self.assertIsNone(router.db_for_read(Post, instance=Post()))
+        self.assertIsNone(router.db_for_write(Comment))
+        self.assertIsNone(sharding.post_shard(1))
+        self.assertIsNone(sharding.author_shard(1))
+
+
+class ShardMigrationTests(TestCase):
+    def test_data_migrations_use_migrated_database(self):
+        """Миграции нового шарда не трогают данные основной базы."""
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=author, author=author)
+        directory = tempfile.mkdtemp()
+        add_shard(os.path.join(directory, 'shard.sqlite3'))
+        try:
+            with override_settings(POST_SHARDS=SHARDS):
+                call_command('migrate', database=SHARD, verbosity=0)
+            self.assertFalse(UserCounters.objects.using(SHARD).exists())
+        finally:
+            remove_shard()
+            shutil.rmtree(directory)
+        self.assertEqual(UserCounters.objects.filter(user=author).count(), 1)
+
+
+@override_settings(POST_SHARDS=SHARDS)
+class ShardingTests(TestCase):
+    databases = {DEFAULT_DB_ALIAS, SHARD}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        add_shard(os.path.join(cls.directory, 'shard.sqlite3'))
+        with override_settings(POST_SHARDS=SHARDS):
+            call_command('migrate', database=SHARD, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        remove_shard()
+        shutil.rmtree(cls.directory)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.old = User.objects.create_user(username='old')
+        cls.new = User.objects.create_user(username='new')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(
+            sharding, 'hashed_shard',
+            lambda author_id: SHARD if author_id == self.new.pk
+            else DEFAULT_DB_ALIAS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, author, text='Пост', minutes=0):
+        with explicit_dates():
+            return Post.objects.create(
+                author=author, group=self.group, text=text,
+                pub_date=timezone.now() - timedelta(minutes=minutes))
+
+    def test_new_author_is_placed_by_hash(self):
+        post = self.post(self.new)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        self.assertEqual(post._state.db, SHARD)
+        self.assertEqual(post.pk % sharding.ID_STRIDE, SHARDS.index(SHARD))
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertEqual(
+            Post.objects.using(SHARD).get(pk=post.pk).comments_count, 1)
+        self.assertEqual(
+            ShardAssignment.objects.get(author=self.new).shard, SHARD)
+        self.assertEqual(User.objects.using(SHARD).filter(
+            pk__in=[self.new.pk, self.reader.pk]).count(), 2)
+        self.assertTrue(
+            Group.objects.using(SHARD).filter(pk=self.group.pk).exists())
+
+    def test_ids_are_unique_across_shards(self):
+        ids = [self.post(author).pk for author in (self.old, self.new) * 3]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_legacy_author_stays_in_default(self):
+        with override_settings(POST_SHARDS=[DEFAULT_DB_ALIAS]):
+            self.post(self.new, 'До шардирования')
+        post = self.post(self.new, 'После')
+        self.assertEqual(post._state.db, DEFAULT_DB_ALIAS)
+
+    def test_mirrors_follow_renames(self):
+        self.post(self.new)
+        self.new.first_name = 'Новое имя'
+        self.new.save()
+        self.assertEqual(
+            User.objects.using(SHARD).get(pk=self.new.pk).first_name,
+            'Новое имя')
+
+    def test_reconcile_counts_every_shard(self):
+        """Пересчёт не обнуляет посты и комментарии в других шардах."""
+        post = self.post(self.new)
+        self.post(self.old)
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        UserCounters.objects.filter(user=self.new).update(posts_count=5)
+        Post.objects.using(SHARD).update(comments_count=0)
+        counters.reconcile()
+        self.assertEqual(UserCounters.objects.get(
+            user=self.new).posts_count, 1)
+        self.assertEqual(UserCounters.objects.get(
+            user=self.old).posts_count, 1)
+        self.assertEqual(
+            Post.objects.using(SHARD).get(pk=post.pk).comments_count, 1)
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_profile_and_post_detail_read_author_shard(self):
+        post = self.post(self.new, 'Пост из шарда')
+        self.client.force_login(self.reader)
+        self.client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий в шард'})
+        self.assertTrue(Comment.objects.using(SHARD).filter(
+            post_id=post.pk, text='Комментарий в шард').exists())
+        response = self.client.get(reverse('posts:profile', args=['new']))
+        self.assertContains(response, 'Пост из шарда')
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, 'Комментарий в шард')
+
+    def page(self, url, cursor=None):
+        response = self.client.get(url, {'cursor': cursor} if cursor else {})
+        page = response.context['page_obj']
+        return [post.pk for post in page], page.next_cursor
+
+    def test_global_feeds_merge_shards(self):
+        posts = [
+            self.post((self.old, self.new)[minutes % 2], minutes=minutes)
+            for minutes in range(12)
+        ]
+        Follow.objects.create(user=self.reader, author=self.old)
+        Follow.objects.create(user=self.reader, author=self.new)
+        self.client.force_login(self.reader)
+        expected = [post.pk for post in posts]
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=['group']),
+                    reverse('posts:follow_index')):
+            with self.subTest(url=url):
+                first, cursor = self.page(url)
+                second, _ = self.page(url, cursor)
+                self.assertEqual(first + second, expected)
+
+    def test_feed_shows_moving_posts_once(self):
+        post = self.post(self.new)
+        resharding.sync(self.new.pk, SHARD, DEFAULT_DB_ALIAS)
+        pks, _ = self.page(reverse('posts:index'))
+        self.assertEqual(pks, [post.pk])
+
+    def test_reshard_moves_author(self):
+        posts = [self.post(self.new, f'Слово {number}') for number in range(3)]
+        comment = Comment.objects.create(
+            post=posts[0], author=self.reader, text='Ответ')
+        call_command(
+            'reshard', 'new', '--to', DEFAULT_DB_ALIAS, stdout=StringIO())
+        self.assertFalse(Post.objects.using(SHARD).exists())
+        self.assertFalse(Comment.objects.using(SHARD).exists())
+        self.assertEqual(
+            set(Post.objects.values_list('pk', flat=True)),
+            {post.pk for post in posts})
+        self.assertEqual(Comment.objects.get().pk, comment.pk)
+        self.assertEqual(sharding.author_shard(self.new.pk), DEFAULT_DB_ALIAS)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[posts[0].pk]))
+        self.assertContains(response, 'Ответ')
+        if search.is_supported():
+            found, _ = search.search('Слово')
+            self.assertEqual(len(found), 3)
+
+        call_command('reshard', '--rebalance', stdout=StringIO())
+        self.assertEqual(Post.objects.using(SHARD).count(), 3)
+        self.assertEqual(sharding.author_shard(self.new.pk), SHARD)
+        response = self.client.get(reverse('posts:profile', args=['new']))
+        self.assertContains(response, 'Слово 2')
+
+    def test_api_export_merges_shards(self):
+        posts = [
+            self.post((self.old, self.new)[minutes % 2], minutes=minutes)
+            for minutes in range(6)
+        ]
+        resharding.sync(self.new.pk, SHARD, DEFAULT_DB_ALIAS)
+        response = self.client.get(
+            reverse('posts:api_posts'), {'format': 'ndjson'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(row)['id'] for row in rows],
+            [post.pk for post in posts])
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import sqlite_cache
+from core.sqlite_cache import SQLiteCache
+
+
+def set_in_child(location):
+    SQLiteCache(location, {}).set('shared', 'из другого процесса')
+
+
+def add_in_child(location, queue):
+    queue.put(SQLiteCache(location, {}).add('lock', os.getpid(), 30))
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        self.cache.set('page', {'content': b'<html>'})
+        self.assertEqual(self.cache.get('page'), {'content': b'<html>'})
+        self.assertFalse(self.cache.add('page', 'другое'))
+        self.assertTrue(self.cache.add('version', 1))
+        self.assertEqual(self.cache.incr('version'), 2)
+        self.assertEqual(
+            self.cache.get_many(['page', 'version', 'missing']),
+            {'page': {'content': b'<html>'}, 'version': 2})
+        self.cache.delete('page')
+        self.assertIsNone(self.cache.get('page'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_entries_are_gone_and_can_be_added(self):
+        self.cache.set('lock', 1, 0)
+        self.assertIsNone(self.cache.get('lock'))
+        self.assertFalse(self.cache.has_key('lock'))
+        self.assertTrue(self.cache.add('lock', 2))
+        self.assertEqual(self.cache.get('lock'), 2)
+
+    def test_processes_share_entries(self):
+        context = multiprocessing.get_context('spawn')
+        child = context.Process(target=set_in_child, args=(self.location,))
+        child.start()
+        child.join()
+        self.assertEqual(self.cache.get('shared'), 'из другого процесса')
+
+    def test_add_is_atomic_across_processes(self):
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        children = [
+            context.Process(target=add_in_child, args=(self.location, queue))
+            for _ in range(4)
+        ]
+        for child in children:
+            child.start()
+        for child in children:
+            child.join()
+        self.assertEqual(
+            sorted(queue.get() for _ in children), [False, False, False, True])
+
+    @mock.patch.object(sqlite_cache, 'CULL_EVERY', 1)
+    @mock.patch.object(sqlite_cache, 'TOUCH_BATCH', 1)
+    def test_least_recently_read_entries_are_evicted(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=5)
+        for number in range(10):
+            cache.set(f'key{number}', number)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+    @mock.patch.object(sqlite_cache, 'CULL_EVERY', 1)
+    def test_size_limit(self):
+        cache = self.make_cache(MAX_SIZE=10000)
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 2000)
+        size, = cache.connection.execute(
+            'SELECT SUM(size) FROM cache').fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertEqual(cache.get('key9'), 'x' * 2000)
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from core import db
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    def open(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'tuning.sqlite3'),
+        }, alias='tuning')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper.connection
+
+    def pragma(self, raw, name):
+        return raw.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_new_connections_are_tuned(self):
+        raw = self.open()
+        self.assertEqual(self.pragma(raw, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(raw, 'synchronous'), 1)
+        self.assertEqual(
+            self.pragma(raw, 'busy_timeout'), db.PRAGMAS['busy_timeout'])
+        self.assertEqual(
+            self.pragma(raw, 'cache_size'), db.PRAGMAS['cache_size'])
+        self.assertEqual(
+            self.pragma(raw, 'mmap_size'), db.PRAGMAS['mmap_size'])
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_settings_override_pragmas(self):
+        raw = self.open()
+        self.assertEqual(self.pragma(raw, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(raw, 'journal_mode'), 'delete')
@@ -0,0 +1,32 @@
+from unittest import mock
+
+from django.conf import settings
+from django.template.loaders.filesystem import Loader
+from django.test import SimpleTestCase
+
+from core import template_cache
+from posts.benchmarks.templates import make_backend
+
+
+class TemplateCacheTests(SimpleTestCase):
+    def test_precompiled_templates_skip_disk(self):
+        engine = make_backend('cached').engine
+        count = template_cache.warm_up(engine)
+        names = template_cache.template_names([settings.TEMPLATES_DIR])
+        self.assertEqual(count, len(names))
+        self.assertIn('posts/includes/paginator.html', names)
+        with mock.patch.object(
+                Loader, 'get_contents', side_effect=OSError('диск')):
+            engine.get_template('posts/index.html')
+            engine.get_template('includes/header.html')
+
+    def test_disk_mode_is_not_precompiled(self):
+        engine = make_backend('disk').engine
+        self.assertFalse(template_cache.is_cached(engine))
+        self.assertEqual(template_cache.precompile(engine), 0)
+
+    def test_libraries_are_loaded(self):
+        engine = make_backend('disk').engine
+        template_cache.load_libraries(engine)
+        for name in template_cache.LIBRARIES:
+            self.assertIn(name, engine.template_libraries)
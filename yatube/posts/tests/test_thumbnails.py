@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import replicas
+from posts import jobs, thumbnails
+from posts.models import Job, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'data:image/svg+xml'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, name='small.gif'):
+        return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+    def test_upload_schedules_thumbnail(self):
+        """Картинка из формы сохраняется и ставится в очередь."""
+        self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': self.upload()},
+        )
+        post = Post.objects.get(text='С картинкой')
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertEqual(
+            set(Job.objects.values_list('name', 'status')),
+            {('thumbnails.generate', Job.PENDING),
+             ('thumbnails.variants', Job.PENDING)},
+        )
+        self.assertIn(post.image.name, Job.objects.get(
+            name='thumbnails.variants').payload)
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Страница не ресайзит картинку, а ждёт фоновую задачу."""
+        Post.objects.create(
+            text='Пост', author=self.user, image=self.upload())
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, PLACEHOLDER)
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_scheduling_is_idempotent(self):
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=self.upload())
+        thumbnails.schedule_image(post.image)
+        thumbnails.schedule_image(post.image)
+        self.assertEqual(
+            Job.objects.count(), len(thumbnails.GEOMETRIES) + 1)
+        geometry, options = thumbnails.GEOMETRIES[0]
+        with self.assertNumQueries(1):
+            self.assertFalse(
+                thumbnails.schedule(post.image, geometry, options))
+        jobs.run_pending()
+        self.assertEqual(thumbnails.schedule_image(post.image), 0)
+
+    def test_unreadable_image_fails_after_retries(self):
+        post = Post.objects.create(
+            text='Пост', author=self.user, image='posts/missing.jpg')
+        thumbnails.schedule_image(post.image)
+        for _ in range(jobs.MAX_ATTEMPTS):
+            # Повторы ждут задержки, здесь её пропускаем.
+            Job.objects.update(run_after=timezone.now())
+            with self.assertLogs(level='WARNING'):
+                jobs.run_pending()
+        for job in Job.objects.all():
+            self.assertEqual(job.status, Job.FAILED)
+            self.assertEqual(job.attempts, jobs.MAX_ATTEMPTS)
+
+    def test_prewarm_command(self):
+        Post.objects.create(
+            text='Пост', author=self.user, image=self.upload())
+        call_command('prewarm_thumbnails', workers=1, stdout=StringIO())
+        self.assertEqual(
+            set(Job.objects.values_list('status', flat=True)), {Job.DONE})
@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, User
+from posts.utils import CursorPaginator
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.post = Post.objects.create(text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self):
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'Writer'}))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.post).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика."""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка очищает ленту от постов автора."""
+        self.follow()
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Writer'}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты из подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 1)
+
+    def test_feed_page_is_index_range(self):
+        """Страница ленты читается по индексу без сортировки в памяти."""
+        posts = CursorPaginator(
+            timeline.feed(self.reader), 10, 'feed_date', tiebreak='feed_pk',
+        ).object_list[:11]
+        sql, params = posts.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('timeline_user_feed_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_rebuild_limited_to_users(self):
+        """Пересборка по списку читателей не трогает чужие ленты."""
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        TimelineEntry.objects.all().delete()
+        self.assertEqual(timeline.rebuild([self.reader.pk]), 1)
+        self.assertFalse(TimelineEntry.objects.filter(user=other).exists())
+        self.assertEqual(timeline.rebuild(), 2)
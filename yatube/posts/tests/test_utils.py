@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.utils import CursorPaginator, decode_cursor
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestAuthor')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(23))
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_next_and_previous_cursors(self):
+        """Курсоры обходят ленту вперёд и назад без пропусков."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_page()
+        second = paginator.get_page(cursor=first.next_cursor)
+        third = paginator.get_page(cursor=second.next_cursor)
+        self.assertEqual(
+            list(first) + list(second) + list(third), self.expected)
+        self.assertIsNone(third.next_cursor)
+        back = paginator.get_page(cursor=third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(back.number, 2)
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        token = CursorPaginator(Post.objects.all(), 10).get_page().next_cursor
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            paginator.get_page(cursor=token)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        self.assertIsNone(decode_cursor('не курсор'))
+        response = self.client.get(reverse('posts:index') + '?cursor=xyz')
+        self.assertEqual(
+            list(response.context['page_obj']), self.expected[:10])
+
+    def test_page_number_compatibility(self):
+        """Ссылки ?page=N продолжают работать."""
+        response = self.client.get(reverse('posts:index') + '?page=3')
+        self.assertEqual(
+            list(response.context['page_obj']), self.expected[20:])
+        self.assertEqual(response.context['page_obj'].number, 3)
@@ -5,7 +5,9 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Follow, Group, Post, User
@@ -222,20 +224,19 @@ class GroupPagesTests(TestCase):
         self.assertEqual(context__first_object.text, comment_text)
 
     def test_cache_index_page(self):
-        """Проверка работы cache на главной странице"""
+        """Главная страница берётся из кеша до изменения постов"""
         post = Post.objects.create(
             text='Текст для проверки работы cache',
             author=self.user)
         added_content = self.authorized_client.get(
             reverse('posts:index')).content
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNone(response.context)
+        self.assertEqual(response.content, added_content)
         post.delete()
         deleted_content = self.authorized_client.get(
             reverse('posts:index')).content
-        self.assertEqual(added_content, deleted_content)
-        cache.clear()
-        cache_cleared_content = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertNotEqual(added_content, cache_cleared_content)
+        self.assertNotEqual(added_content, deleted_content)
 
     def test_page_404(self):
         response = self.authorized_client.get('notexistpage')
@@ -302,3 +303,53 @@ class GroupPagesTests(TestCase):
         )
         context_len_not_follower = len(response.context["page_obj"])
         self.assertEqual(context_len_not_follower, 1)
+
+
+class FeedQueriesTests(TestCase):
+    """Число запросов страницы не зависит от числа авторов и групп."""
+    PAGES = {
+        'posts:index': {},
+        'posts:group_list': {'slug': 'shared'},
+        'posts:profile': {'username': 'author0'},
+        'posts:follow_index': {},
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Общая группа', slug='shared', description='Описание')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def publish(self, authors, groups):
+        for i in range(10):
+            author, _ = User.objects.get_or_create(
+                username=f'author{i % authors}')
+            Follow.objects.get_or_create(user=self.reader, author=author)
+            group = self.group
+            if i % groups:
+                group, _ = Group.objects.get_or_create(
+                    slug=f'group{i % groups}',
+                    defaults={'title': f'Группа {i}', 'description': ''})
+            Post.objects.create(text=f'Пост {i}', author=author, group=group)
+
+    def count_queries(self):
+        counts = {}
+        for name, kwargs in self.PAGES.items():
+            cache.clear()
+            url = reverse(name, kwargs=kwargs)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts[name] = len(queries)
+        return counts
+
+    def test_query_count_is_fixed(self):
+        self.publish(authors=1, groups=1)
+        single = self.count_queries()
+        Post.objects.all().delete()
+        self.publish(authors=10, groups=10)
+        self.assertEqual(self.count_queries(), single)
@@ -0,0 +1,138 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Шаблоны по-прежнему вызывают `{% thumbnail %}`, но бэкенд sorl-thumbnail
+не ресайзит картинку в запросе: готовая миниатюра берётся из kvstore,
+а для отсутствующей ставится задача очереди `posts.jobs` и отдаётся
+заглушка того же размера. После генерации сбрасывается кеш страниц
+поста. Той же очередью строятся адаптивные варианты картинки
+(`posts.images`); сами задачи — в `posts.tasks`.
+"""
+from urllib.parse import quote
+
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from core import replicas
+
+from . import cache, images, jobs, sharding
+from .models import Post
+
+# Размеры и параметры, с которыми шаблоны выводят картинки постов.
+GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+
+class Placeholder(DummyImageFile):
+    """Серый прямоугольник размера миниатюры, пока она не готова."""
+
+    @property
+    def url(self):
+        svg = (
+            '<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{self.x}" height="{self.y}">'
+            '<rect width="100%" height="100%" fill="#e9ecef"/></svg>'
+        )
+        return f'data:image/svg+xml,{quote(svg)}'
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не генерирует миниатюры в запросе."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        name = self.thumbnail_name(file_, geometry_string, options)
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        if cached:
+            return cached
+        schedule(file_, geometry_string, options, name)
+        return Placeholder(geometry_string)
+
+    def generate(self, file_, geometry_string, **options):
+        """Обычное поведение sorl: читает картинку и пишет миниатюру."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def thumbnail_name(self, file_, geometry_string, options):
+        """Имя файла миниатюры, как его вычисляет `get_thumbnail`."""
+        source = ImageFile(file_)
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+
+backend = DeferredThumbnailBackend()
+
+
+def schedule(image, geometry, options, name=None, wake=True):
+    """Ставит миниатюру в очередь, если её там ещё нет.
+
+    Вызывается при выводе страницы, поэтому ждущая задача не пишется
+    заново, а постановка не переводит читателя на основную базу.
+    Возвращает, поставлена ли задача.
+    """
+    name = name or backend.thumbnail_name(image, geometry, options)
+    key = f'thumbnail:{name}'
+    if jobs.is_pending(key):
+        return False
+    # Готовая по журналу, но пропавшая из kvstore миниатюра пересоздаётся.
+    with replicas.unpinned():
+        jobs.push(
+            'thumbnails.generate',
+            (getattr(image, 'name', image), geometry, options),
+            key=key, again=True, wake=wake,
+        )
+    return True
+
+
+def schedule_image(image, wake=True):
+    """Очередь на все размеры, в которых шаблоны показывают картинку,
+    и на адаптивные варианты.
+
+    Возвращает число поставленных задач: готовое пропускается.
+    """
+    scheduled = 0
+    for geometry, options in GEOMETRIES:
+        name = backend.thumbnail_name(image, geometry, options)
+        if not default.kvstore.get(ImageFile(name, default.storage)):
+            scheduled += schedule(image, geometry, options, name, wake)
+    image_name = getattr(image, 'name', image)
+    if any(shard.exists() for shard in sharding.spread(
+            Post.objects.filter(image=image_name, image_variants=''))):
+        jobs.push(
+            'thumbnails.variants', (image_name,),
+            key=f'variants:{image_name}', again=True, wake=wake)
+        scheduled += 1
+    return scheduled
+
+
+def generate(image, geometry, options):
+    thumbnail = backend.generate(image, geometry, **options)
+    # sorl не бросает исключений, если исходник не читается.
+    if not default.kvstore.get(thumbnail):
+        raise OSError(f'Не удалось прочитать {image}')
+    refresh_pages(image)
+
+
+def generate_variants(image):
+    images.generate(image)
+    refresh_pages(image)
+
+
+def refresh_pages(image):
+    """Страницы с заглушкой вместо картинки собираются заново."""
+    posts = Post.objects.filter(image=image).select_related('author', 'group')
+    cache.bump(*(
+        scope for shard in sharding.spread(posts) for post in shard
+        for scope in cache.post_changed_scopes(post)
+    ))
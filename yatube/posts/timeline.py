@@ -0,0 +1,127 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Каждый пост автора раскладывается по лентам его подписчиков в момент
+записи, поэтому страница `follow_index` читается одним диапазоном
+индекса `(user, -pub_date, -post)` вместо подзапроса по `Follow`.
+Ленту листают по (`feed_date`, `feed_pk`) — колонкам этого индекса.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from . import sharding
+from .models import Follow, Post, TimelineEntry, User
+
+BATCH_SIZE = 500
+
+
+def fan_out(post):
+    """Добавляет пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                author_id=post.author_id,
+                post_id=post.pk,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту читателя постами автора, на которого он подписался."""
+    posts = Post.objects.using(sharding.author_shard(author_id)).filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                author_id=author_id,
+                post_id=post_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def discard(post):
+    """Убирает пост из всех лент: из шарда каскад до ленты не доходит."""
+    TimelineEntry.objects.filter(post_id=post.pk).delete()
+
+
+def feed(user):
+    """Посты ленты подписок; `feed_date` берётся из индекса ленты.
+
+    С шардами посты не присоединить к ленте в одном запросе: тогда
+    лента отдаёт свои записи, а посты страницы подставляет `load_posts`.
+    """
+    if sharding.is_sharded():
+        return TimelineEntry.objects.filter(user=user).annotate(
+            feed_date=F('pub_date'), feed_pk=F('post_id'))
+    return Post.objects.for_feed().filter(
+        timeline_entries__user=user
+    ).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_pk=F('timeline_entries__post_id'),
+    ).order_by('-feed_date', '-feed_pk')
+
+
+def load_posts(page):
+    """Заменяет записи ленты на странице постами из их шардов."""
+    entries = [
+        entry for entry in page.object_list
+        if isinstance(entry, TimelineEntry)
+    ]
+    if not entries:
+        return page
+    posts = sharding.in_bulk(Post.objects.for_feed(), {
+        entry.post_id: entry.author_id for entry in entries})
+    page.object_list = []
+    for entry in entries:
+        post = posts.get(entry.post_id)
+        if post is not None:
+            post.feed_date = entry.pub_date
+            page.object_list.append(post)
+    return page
+
+
+def readers(users=None):
+    """id читателей, чьи ленты пересобирает `rebuild`."""
+    if users is not None:
+        return list(User.objects.filter(pk__in=users).values_list(
+            'pk', flat=True).order_by('pk'))
+    followers = Follow.objects.values_list('user_id', flat=True)
+    owners = TimelineEntry.objects.values_list('user_id', flat=True)
+    return sorted(set(followers.distinct()) | set(owners.distinct()))
+
+
+def rebuild(users=None):
+    """Пересобирает ленты из `Follow` и `Post`; возвращает число записей.
+
+    Лента каждого читателя пересобирается в своей транзакции, чтобы
+    SQLite не держал блокировку записи всю пересборку.
+    """
+    user_ids = readers(users)
+    for user_id in user_ids:
+        with transaction.atomic():
+            TimelineEntry.objects.filter(user_id=user_id).delete()
+            for author_id in Follow.objects.filter(
+                    user_id=user_id).values_list('author_id', flat=True):
+                backfill(user_id, author_id)
+    entries = TimelineEntry.objects.all()
+    if users is not None:
+        entries = entries.filter(user__in=users)
+    return entries.count()
@@ -1,6 +1,6 @@
-from django.urls import path
+from django.urls import path, re_path
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -14,7 +14,10 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.post_search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -25,4 +28,18 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    re_path(r'^feeds/(?P<feed_type>rss|atom)/$',
+            feeds.index_feed, name='index_feed'),
+    re_path(r'^group/(?P<slug>[-\w]+)/(?P<feed_type>rss|atom)/$',
+            feeds.group_feed, name='group_feed'),
+    re_path(r'^profile/(?P<username>[^/]+)/(?P<feed_type>rss|atom)/$',
+            feeds.profile_feed, name='profile_feed'),
+    path('api/posts/', api.post_list, name='api_posts'),
+    path('api/groups/', api.group_list, name='api_groups'),
+    path('api/groups/<slug:slug>/posts/',
+         api.group_posts, name='api_group_posts'),
+    path('api/authors/<str:username>/posts/',
+         api.author_posts, name='api_author_posts'),
+    path('api/posts/<int:post_id>/comments/',
+         api.post_comments, name='api_post_comments'),
 ]
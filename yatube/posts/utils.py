@@ -1,10 +1,189 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from contextlib import contextmanager
+from datetime import datetime
+from hashlib import md5
+
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import sharding
+from .models import Comment, Post
 
 TOP_TEN = 10
+COMMENTS_PER_PAGE = 20
+# Глубина, до которой работают ссылки вида ?page=N и полоса номеров.
+SHALLOW_PAGES = 5
+COUNT_CACHE_TIMEOUT = 60
+
+
+@contextmanager
+def explicit_dates():
+    """Даёт задать pub_date и created: auto_now_add их перезаписывает."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def encode_cursor(value, pk, number, backwards=False):
+    """Упаковывает позицию в ленте в непрозрачный токен для ?cursor=.
+
+    Ключ позиции — дата или число (например, релевантность поиска).
+    """
+    if isinstance(value, datetime):
+        value = f'd{value.isoformat()}'
+    else:
+        value = f'f{float(value)!r}'
+    raw = f'{value}|{pk}|{number}|{int(backwards)}'
+    return urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    """Возвращает (ключ, id, номер страницы, назад) или None."""
+    try:
+        raw = urlsafe_b64decode(token.encode()).decode()
+        value, pk, number, backwards = raw.split('|')
+        kind, value = value[:1], value[1:]
+        if kind == 'd':
+            value = parse_datetime(value)
+        elif kind == 'f':
+            value = float(value)
+        else:
+            return None
+        if value is None:
+            return None
+        return value, int(pk), max(int(number), 1), backwards == '1'
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (key, id): без COUNT(*) и растущего OFFSET.
+
+    `key` — поле или аннотация, по убыванию которой идёт лента,
+    обычно дата публикации. Каждая страница читает на один объект
+    больше, чем выводит, чтобы узнать, есть ли следующая. Общее число
+    объектов нужно только для полосы номеров и берётся из кеша.
+    С `gather=True` лента собирается со всех шардов, см. posts.sharding.
+    `tiebreak` — поле, которое упорядочивает объекты с равным ключом;
+    оно должно идти в индексе сразу за ключом.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date', gather=False,
+                 tiebreak='pk'):
+        self.key = key
+        self.gather = gather
+        self.tiebreak = tiebreak
+        super().__init__(
+            object_list.order_by(f'-{key}', f'-{tiebreak}'), per_page)
+
+    @cached_property
+    def count(self):
+        """Приблизительное число объектов, COUNT(*) кешируется."""
+        if self.object_list.query.is_empty():
+            return 0
+        query = str(self.object_list.query).encode()
+        key = f'paginator-count:{md5(query).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            queryset = self.object_list
+            if queryset.query.annotations:
+                # Аннотации вроде bm25() нельзя вычислять в подзапросе
+                # COUNT(*), считаем только сами id.
+                queryset = queryset.model._default_manager.filter(
+                    pk__in=queryset.values('pk'))
+            count = sum(shard.count() for shard in self.spread(queryset))
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def spread(self, queryset):
+        return sharding.spread(queryset) if self.gather else [queryset]
+
+    def fetch(self, queryset, stop, start=0, descending=True):
+        if not self.gather:
+            return list(queryset[start:stop])
+        return sharding.gather(queryset, self.key, stop, start, descending)
+
+    @cached_property
+    def shallow_range(self):
+        return range(1, min(self.num_pages, SHALLOW_PAGES) + 1)
+
+    def get_page(self, number=None, cursor=None):
+        position = cursor and decode_cursor(cursor)
+        if position:
+            return self.cursor_page(*position)
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        return self.offset_page(number)
+
+    def offset_page(self, number):
+        """Страница по номеру: совместимость со ссылками ?page=N."""
+        bottom = (number - 1) * self.per_page
+        rows = self.fetch(
+            self.object_list, bottom + self.per_page + 1, bottom)
+        if not rows and number > 1:
+            return self.offset_page(max(min(self.num_pages, number - 1), 1))
+        return self.build_page(
+            rows[:self.per_page], number,
+            has_previous=number > 1,
+            has_next=len(rows) > self.per_page,
+        )
+
+    def cursor_page(self, value, pk, number, backwards=False):
+        """Страница, примыкающая к позиции (value, pk) из токена."""
+        lookup = 'gt' if backwards else 'lt'
+        rows = self.object_list.filter(
+            Q(**{f'{self.key}__{lookup}': value})
+            | Q(**{self.key: value, f'{self.tiebreak}__{lookup}': pk})
+        )
+        if backwards:
+            rows = rows.reverse()
+        rows = self.fetch(
+            rows, self.per_page + 1, descending=not backwards)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return self.build_page(
+                rows, number if more else 1,
+                has_previous=more, has_next=True,
+            )
+        return self.build_page(
+            rows, number, has_previous=True, has_next=more)
+
+    def build_page(self, rows, number, has_previous, has_next):
+        page = self._get_page(rows, number, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows and has_next:
+            last = rows[-1]
+            page.next_cursor = encode_cursor(
+                getattr(last, self.key), getattr(last, self.tiebreak),
+                number + 1)
+        if rows and has_previous:
+            first = rows[0]
+            page.previous_cursor = encode_cursor(
+                getattr(first, self.key), getattr(first, self.tiebreak),
+                number - 1, backwards=True,
+            )
+        return page
 
 
-def paginations(request, posts):
-    paginator = Paginator(posts, TOP_TEN)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def paginations(request, posts, key='pub_date', gather=False,
+                tiebreak='pk'):
+    paginator = CursorPaginator(posts, TOP_TEN, key, gather, tiebreak)
+    page_obj = paginator.get_page(
+        request.GET.get('page'), request.GET.get('cursor'))
     return page_obj
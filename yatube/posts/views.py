@@ -1,28 +1,36 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from . import counters, search, sharding, thumbnails, timeline
+from .cache import (cached_page, comments_scopes, conditional_page,
+                    group_modified, group_scopes, index_modified,
+                    index_scopes, post_modified, post_scopes,
+                    profile_modified, profile_scopes, search_scopes)
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import paginations
+from .utils import COMMENTS_PER_PAGE, CursorPaginator, paginations
 
 TOP_TEN = 10
 
 
-@cache_page(20)
+@conditional_page(index_scopes, index_modified)
+@cached_page(index_scopes)
 def index(request):
-    posts = Post.objects.all()
-    page_obj = paginations(request, posts)
+    posts = Post.objects.for_feed()
+    page_obj = paginations(request, posts, gather=True)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_scopes, group_modified)
+@cached_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginations(request, posts)
+    posts = group.posts.for_feed()
+    page_obj = paginations(request, posts, gather=True)
     context = {
         'group': group,
         "page_obj": page_obj,
@@ -30,40 +38,90 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_scopes, profile_modified)
+@cached_page(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    posts = author.posts.for_feed()
     page_obj = paginations(request, posts)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
     context = {
         'page_obj': page_obj,
         'author': author,
+        'counters': counters.for_user(author),
         'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cached_page(search_scopes)
+def post_search(request):
+    """Поиск по текстам постов"""
+    query = request.GET.get('q', '').strip()
+    page_obj = []
+    if query:
+        posts, key = search.search(query, Post.objects.for_feed())
+        page_obj = paginations(request, posts, key=key, gather=True)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_scopes, post_modified)
+@cached_page(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.using(sharding.post_shard(post_id)).select_related(
+            'author__counters', 'group'),
+        pk=post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE,
+        key='created',
+    ).get_page()
     context = {
         "post": post,
+        "author_counters": counters.for_user(post.author),
         "form": form,
         "comments": comments
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cached_page(comments_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев поста в виде HTML-фрагмента."""
+    post = get_object_or_404(
+        Post.objects.using(sharding.post_shard(post_id)).only('pk'),
+        pk=post_id)
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE,
+        key='created',
+    ).get_page(cursor=request.GET.get('cursor'))
+    context = {
+        "post": post,
+        "comments": comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     if request.method == 'POST':
-        form = PostForm(request.POST or None)
+        form = PostForm(request.POST or None, files=request.FILES or None)
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            with transaction.atomic():
+                post.save()
+                if post.image:
+                    thumbnails.schedule_image(post.image)
             return redirect(f'/profile/{post.author}/', {'form': form})
     form = PostForm()
     groups = Group.objects.all()
@@ -76,7 +134,8 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.using(sharding.post_shard(post_id)), pk=post_id)
     groups = Group.objects.all()
     form = PostForm(
         request.POST or None,
@@ -85,7 +144,10 @@ def post_edit(request, post_id):
     if request.user != post.author:
         return redirect("posts:post_detail", post_id)
     if form.is_valid():
-        post = form.save()
+        with transaction.atomic():
+            post = form.save()
+            if 'image' in form.changed_data and post.image:
+                thumbnails.schedule_image(post.image)
         return redirect("posts:post_detail", post_id)
     context = {
         "form": form,
@@ -98,23 +160,24 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.using(sharding.post_shard(post_id)), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
     """Посты любимых авторов"""
-    user = get_object_or_404(User, username=request.user)
-    followed_author = Follow.objects.filter(user=user).values("author")
-    post_list = Post.objects.filter(author__in=followed_author)
-    page_obj = paginations(request, post_list)
+    post_list = timeline.feed(request.user)
+    page_obj = timeline.load_posts(paginations(
+        request, post_list, key='feed_date', tiebreak='feed_pk'))
 
     context = {
         "page_obj": page_obj,
@@ -136,8 +199,7 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Oтписка"""
     author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(user=request.user, author=author).exists():
-        Follow.objects.filter(user=request.user, author=author).delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username)
 
 
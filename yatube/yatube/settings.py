@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -29,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,7 +46,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfiledDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -65,9 +68,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами; PRAGMA задаёт core.db.
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Реплики только для чтения: YATUBE_REPLICAS=/path/a.sqlite3,/path/b.sqlite3.
+# Локально это копии основной базы, их обновляет команда sync_replicas.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path}?mode=ro',
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+# Шарды постов и комментариев: YATUBE_SHARDS=/path/s1.sqlite3,/path/s2.sqlite3.
+# Основная база — всегда первый шард; новые дописываются только в конец
+# и перед работой получают схему: migrate --database shardN.
+POST_SHARDS = ['default']
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_SHARDS', '').split(',')), 1):
+    DATABASES[f'shard{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': 60,
+    }
+    POST_SHARDS.append(f'shard{number}')
+
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.replicas.ReplicaRouter',
+]
+# Столько секунд после записи пользователь читает с основной базы.
+REPLICA_PIN_SECONDS = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,8 +152,72 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# YATUBE_PRODUCTION=1 включает общий для воркеров кеш в файле SQLite.
+PRODUCTION = os.environ.get('YATUBE_PRODUCTION') == '1'
+
+if PRODUCTION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.profiling.ProfiledSQLiteCache',
+            'LOCATION': os.environ.get(
+                'YATUBE_CACHE_PATH',
+                os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3'),
+            ),
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+                'MAX_SIZE': 256 * 2 ** 20,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.profiling.ProfiledLocMemCache',
+        }
     }
+
+# В боевом режиме шаблоны компилируются один раз: cached.Loader держит
+# их в памяти, а wsgi.py при старте компилирует всё из templates/
+# (core.template_cache.warm_up).
+TEMPLATES_PRECOMPILE = PRODUCTION
+if PRODUCTION:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS'].update(
+        debug=False,
+        loaders=[('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+    )
+
+# Миниатюры генерируются в фоне, страницы до готовности получают заглушку.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+
+# Побочные эффекты записи идут через очередь posts.jobs. Вне боевого
+# режима задачи выполняются сразу, кроме обработки картинок. Пул из
+# JOBS_WORKERS потоков запускает только веб-сервер (yatube/wsgi.py): в
+# тестах, shell и командах очередь разбирает run_workers.
+JOBS_EAGER = not PRODUCTION
+JOBS_WORKERS = int(os.environ.get('YATUBE_JOBS_WORKERS', 2))
+
+# Профилирование запросов: /metrics/ открыт этим адресам и персоналу.
+INTERNAL_IPS = ['127.0.0.1']
+PROFILING_SLOW_REQUEST_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
@@ -1,7 +1,18 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
+from core.template_cache import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Пул фоновых задач заводит только веб-сервер; модели готовы после setup.
+from posts import jobs  # noqa: E402
+
+jobs.serve()
+
+if settings.TEMPLATES_PRECOMPILE:
+    warm_up()